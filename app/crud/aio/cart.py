@@ -0,0 +1,70 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload, joinedload
+from decimal import Decimal
+from typing import List
+from app.models import cart as models_cart
+from app.schemas import cart as schemas_cart
+from app.crud import cart as cart_crud
+
+# Order.items cannot be lazy-loaded outside the session's greenlet, so every
+# read that returns an Order loads its items up front.
+
+async def get_order(db: AsyncSession, order_id: int):
+    result = await db.execute(
+        select(models_cart.Order)
+        .options(selectinload(models_cart.Order.items))
+        .where(models_cart.Order.id == order_id)
+    )
+    return result.scalars().first()
+
+async def get_order_with_items(db: AsyncSession, order_id: int):
+    result = await db.execute(
+        select(models_cart.Order)
+        .options(joinedload(models_cart.Order.items).joinedload(models_cart.OrderItem.product))
+        .where(models_cart.Order.id == order_id)
+    )
+    return result.unique().scalars().first()
+
+async def get_order_item_with_order(db: AsyncSession, item_id: int):
+    result = await db.execute(
+        select(models_cart.OrderItem)
+        .options(joinedload(models_cart.OrderItem.order), joinedload(models_cart.OrderItem.product))
+        .where(models_cart.OrderItem.id == item_id)
+    )
+    return result.scalars().first()
+
+async def get_pending_order_for_user(db: AsyncSession, user_id: int):
+    result = await db.execute(
+        select(models_cart.Order)
+        .options(selectinload(models_cart.Order.items))
+        .where(
+            models_cart.Order.user_id == user_id,
+            models_cart.Order.status == "Pending"
+        )
+    )
+    return result.scalars().first()
+
+async def create_new_order(db: AsyncSession, user_id: int):
+    return await db.run_sync(cart_crud.create_new_order, user_id=user_id)
+
+async def add_item_to_order(db: AsyncSession, order_id: int, product_id: int, quantity: int, price: Decimal):
+    return await db.run_sync(
+        cart_crud.add_item_to_order, order_id=order_id, product_id=product_id, quantity=quantity, price=price
+    )
+
+async def handle_add_to_cart(
+    db: AsyncSession,
+    user_id: int,
+    item_details: schemas_cart.CartItemCreate,
+    current_price: Decimal
+):
+    return await db.run_sync(
+        cart_crud.handle_add_to_cart, user_id=user_id, item_details=item_details, current_price=current_price
+    )
+
+async def bulk_add_to_cart(db: AsyncSession, user_id: int, lines: List[schemas_cart.CartItemCreate]):
+    return await db.run_sync(cart_crud.bulk_add_to_cart, user_id=user_id, lines=lines)
+
+async def update_order_status(db: AsyncSession, order_id: int, new_status: str):
+    return await db.run_sync(cart_crud.update_order_status, order_id=order_id, new_status=new_status)
@@ -0,0 +1,42 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from app.models import category as models_category
+from app.models import product as models_product
+from app.schemas import category as schemas_category
+from app.crud import category as category_crud
+from app.utils.cache import category_cache
+
+async def get_category(db: AsyncSession, category_id: int):
+    result = await db.execute(select(models_category.Category).where(models_category.Category.id == category_id))
+    return result.scalars().first()
+
+async def get_categories(db: AsyncSession):
+    result = await db.execute(select(models_category.Category))
+    return result.scalars().all()
+
+async def get_categories_cached(db: AsyncSession):
+    async def load():
+        return [schemas_category.Category.model_validate(c) for c in await get_categories(db)]
+
+    return await category_cache.aget_or_load("all", load)
+
+async def get_category_by_name(db: AsyncSession, name: str):
+    result = await db.execute(select(models_category.Category).where(models_category.Category.name == name))
+    return result.scalars().first()
+
+async def create_category(db: AsyncSession, category: schemas_category.CategoryCreate):
+    return await db.run_sync(category_crud.create_category, category=category)
+
+async def get_products_in_category(db: AsyncSession, category_id: int, skip: int = 0, limit: int = 100):
+    result = await db.execute(
+        select(models_product.Product).where(
+            models_product.Product.category_id == category_id
+        ).offset(skip).limit(limit)
+    )
+    return result.scalars().all()
+
+async def get_products_in_category_page(db: AsyncSession, category_id: int, after: Optional[str] = None, limit: int = 100):
+    return await db.run_sync(
+        category_crud.get_products_in_category_page, category_id=category_id, after=after, limit=limit
+    )
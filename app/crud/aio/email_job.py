@@ -0,0 +1,7 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.crud import email_job as email_job_crud
+
+async def enqueue_email(db: AsyncSession, recipient: str, subject: str, body: str, kind: str = "generic"):
+    return await db.run_sync(
+        email_job_crud.enqueue_email, recipient=recipient, subject=subject, body=body, kind=kind
+    )
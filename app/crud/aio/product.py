@@ -0,0 +1,47 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from app.models import product as models_product
+from app.schemas import product as schemas_product
+from app.crud import product as product_crud
+from app.utils.cache import product_cache
+
+# Writes go through the sync implementations with run_sync so the search index
+# stays in sync; run_sync drives them on the async driver without a thread hop.
+
+async def get_product(db: AsyncSession, product_id: int):
+    result = await db.execute(select(models_product.Product).where(models_product.Product.id == product_id))
+    return result.scalars().first()
+
+async def get_product_cached(db: AsyncSession, product_id: int):
+    async def load():
+        db_product = await get_product(db, product_id)
+        return schemas_product.Product.model_validate(db_product) if db_product else None
+
+    return await product_cache.aget_or_load(product_id, load)
+
+async def get_products(db: AsyncSession, skip: int = 0, limit: int = 100):
+    result = await db.execute(select(models_product.Product).offset(skip).limit(limit))
+    return result.scalars().all()
+
+async def get_products_page(db: AsyncSession, after: Optional[str] = None, limit: int = 100):
+    return await db.run_sync(product_crud.get_products_page, after=after, limit=limit)
+
+async def get_product_by_title(db: AsyncSession, title: str):
+    result = await db.execute(select(models_product.Product).where(models_product.Product.title == title))
+    return result.scalars().first()
+
+async def create_product(db: AsyncSession, product: schemas_product.ProductCreate):
+    return await db.run_sync(product_crud.create_product, product=product)
+
+async def update_product(db: AsyncSession, product_id: int, updated_data: schemas_product.ProductUpdate):
+    return await db.run_sync(product_crud.update_product, product_id=product_id, updated_data=updated_data)
+
+async def delete_product(db: AsyncSession, product_id: int):
+    return await db.run_sync(product_crud.delete_product, product_id=product_id)
+
+async def set_product_image(db: AsyncSession, product_id: int, image_url: str):
+    return await db.run_sync(product_crud.set_product_image, product_id=product_id, image_url=image_url)
+
+async def image_in_use(db: AsyncSession, image_url: str):
+    return await db.run_sync(product_crud.image_in_use, image_url=image_url)
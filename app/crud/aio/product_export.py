@@ -0,0 +1,21 @@
+from typing import AsyncIterator
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.crud.product_export import ExportEncoder, export_fields, export_statement
+
+async def iter_export(
+    db: AsyncSession, export_format: str, include_category: bool = False, compress: bool = False
+) -> AsyncIterator[bytes]:
+    """Async counterpart of app.crud.product_export.iter_export, streaming through AsyncSession.stream"""
+    encoder = ExportEncoder(export_fields(include_category), export_format, compress)
+    header = encoder.header()
+    if header:
+        yield header
+    result = await db.stream(export_statement(include_category))
+    try:
+        async for rows in result.partitions():
+            chunk = encoder.encode(rows)
+            if chunk:
+                yield chunk
+    finally:
+        await result.close()
+    yield encoder.finish()
@@ -0,0 +1,5 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.crud import product_filter as product_filter_crud
+
+async def filter_products(db: AsyncSession, **kwargs):
+    return await db.run_sync(product_filter_crud.filter_products, **kwargs)
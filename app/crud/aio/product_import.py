@@ -0,0 +1,17 @@
+from typing import BinaryIO
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.crud.aio import category as category_crud
+from app.crud.product_import import ProductImporter, require_unique_titles
+
+async def import_products(db: AsyncSession, stream: BinaryIO, import_format: str) -> dict:
+    """Async counterpart of app.crud.product_import.import_products; parsing and validation run in the threadpool"""
+    await db.run_sync(require_unique_titles)
+    importer = ProductImporter(await category_crud.get_categories(db), db.get_bind().dialect.name)
+    records = importer.records(stream, import_format)
+    while True:
+        batch = await run_in_threadpool(importer.read_batch, records)
+        if batch is None:
+            break
+        await db.run_sync(importer.write_batch, batch)
+    return importer.result
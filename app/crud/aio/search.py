@@ -0,0 +1,5 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.crud import search as search_crud
+
+async def search_products(db: AsyncSession, q: str, skip: int = 0, limit: int = 20):
+    return await db.run_sync(search_crud.search_products, q=q, skip=skip, limit=limit)
@@ -0,0 +1,66 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.utils import password_hashing
+from datetime import datetime
+from app.models import user as models_user
+from app.schemas import user as schemas_user
+from app.crud import user as user_crud
+from app.utils.email_queue import queue_verification_email, wake_workers
+import secrets
+
+# bcrypt is CPU bound, keep it off the event loop and on the dedicated hashing pool
+async def get_password_hash(password: str):
+    return await password_hashing.hash_password(password)
+
+async def verify_password(plain_password: str, hashed_password: str):
+    return await password_hashing.verify_password(plain_password, hashed_password)
+
+async def get_user(db: AsyncSession, user_id: int):
+    result = await db.execute(select(models_user.User).where(models_user.User.id == user_id))
+    return result.scalars().first()
+
+async def get_user_by_email(db: AsyncSession, email: str):
+    result = await db.execute(select(models_user.User).where(models_user.User.email == email))
+    return result.scalars().first()
+
+async def create_user(db: AsyncSession, user: schemas_user.UserCreate):
+    hashed_password = await get_password_hash(user.password)
+    verification_token = str(secrets.randbelow(1000000)).zfill(6)
+
+    db_user = models_user.User(
+        email=user.email,
+        full_name=user.full_name,
+        hashed_password=hashed_password,
+        is_verified=False,
+        verification_token=verification_token
+    )
+    db.add(db_user)
+    # Same transaction as the user: no account is ever left without its verification email
+    await db.run_sync(queue_verification_email, user.email, verification_token, commit=False)
+    await db.commit()
+    wake_workers()
+    await db.refresh(db_user)
+    return db_user, verification_token
+
+async def verify_email(db: AsyncSession, code: str):
+    return await db.run_sync(user_crud.verify_email, code=code)
+
+async def update_user(db: AsyncSession, user_id: int, user_update: dict):
+    return await db.run_sync(user_crud.update_user, user_id=user_id, user_update=user_update)
+
+async def create_password_reset_token(db: AsyncSession, email: str):
+    return await db.run_sync(user_crud.create_password_reset_token, email=email)
+
+async def reset_password(db: AsyncSession, token: str, new_password: str):
+    result = await db.execute(select(models_user.User).where(models_user.User.reset_token == token))
+    user = result.scalars().first()
+
+    if not user or user.reset_token_expires < datetime.utcnow():
+        return None
+
+    user.hashed_password = await get_password_hash(new_password)
+    user.reset_token = None
+    user.reset_token_expires = None
+    await db.commit()
+    await db.refresh(user)
+    return user
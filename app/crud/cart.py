@@ -1,8 +1,11 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import insert
+from sqlalchemy.orm import Session, joinedload
 from app.models import cart as models_cart
 from app.models import user as models_user
+from app.models import product as models_product
 from app.schemas import cart as schemas_cart
 from decimal import Decimal
+from typing import List
 from fastapi import HTTPException, status
 
 def get_order(db: Session, order_id: int):
@@ -10,6 +13,21 @@ def get_order(db: Session, order_id: int):
     return db.query(models_cart.Order).filter(models_cart.Order.id == order_id).first()
 
 
+def get_order_with_items(db: Session, order_id: int):
+    """Order, its items and each item's product in a single joined query."""
+    return db.query(models_cart.Order).options(
+        joinedload(models_cart.Order.items).joinedload(models_cart.OrderItem.product)
+    ).filter(models_cart.Order.id == order_id).first()
+
+
+def get_order_item_with_order(db: Session, item_id: int):
+    """Cart item together with its order and product, so ownership and stock checks need no extra round trips."""
+    return db.query(models_cart.OrderItem).options(
+        joinedload(models_cart.OrderItem.order),
+        joinedload(models_cart.OrderItem.product)
+    ).filter(models_cart.OrderItem.id == item_id).first()
+
+
 def get_pending_order_for_user(db: Session, user_id: int):
     return db.query(models_cart.Order).filter(                  
         models_cart.Order.user_id == user_id,
@@ -18,6 +36,13 @@ def get_pending_order_for_user(db: Session, user_id: int):
 
 
 def create_new_order(db: Session, user_id: int):
+    db_order = _new_pending_order(db, user_id)
+    db.commit()
+    db.refresh(db_order)
+    return db_order
+
+
+def _new_pending_order(db: Session, user_id: int):
     user = db.query(models_user.User).filter(models_user.User.id == user_id).first()
 
     if not user:
@@ -36,8 +61,7 @@ def create_new_order(db: Session, user_id: int):
         status="Pending"
     )
     db.add(db_order)
-    db.commit()
-    db.refresh(db_order)
+    db.flush()
     return db_order
 
 
@@ -76,6 +100,77 @@ def handle_add_to_cart(
     return db_item
 
 
+def bulk_add_to_cart(db: Session, user_id: int, lines: List[schemas_cart.CartItemCreate]):
+    """
+    Add many lines to the user's pending order in one transaction.
+
+    Products are fetched with a single IN query, lines for the same product are
+    merged, and products already in the cart get their quantity increased
+    instead of a duplicate OrderItem. Returns the affected items as schemas.
+    """
+    quantities = {}
+    for line in lines:
+        if line.quantity <= 0:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Quantity must be greater than 0"
+            )
+        quantities[line.product_id] = quantities.get(line.product_id, 0) + line.quantity
+
+    products = {
+        product.id: product
+        for product in db.query(models_product.Product).filter(
+            models_product.Product.id.in_(quantities.keys())
+        ).all()
+    }
+    unavailable = [pid for pid in quantities if pid not in products or not products[pid].in_stock]
+    if unavailable:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Products not found or out of stock: {unavailable}"
+        )
+
+    order = get_pending_order_for_user(db, user_id)
+    if not order:
+        order = _new_pending_order(db, user_id)
+
+    existing = {
+        item.product_id: item
+        for item in db.query(models_cart.OrderItem).filter(
+            models_cart.OrderItem.order_id == order.id,
+            models_cart.OrderItem.product_id.in_(quantities.keys())
+        ).all()
+    }
+
+    new_rows = []
+    for product_id, quantity in quantities.items():
+        item = existing.get(product_id)
+        if item:
+            item.quantity += quantity
+            item.price = products[product_id].price
+        else:
+            new_rows.append({
+                "order_id": order.id,
+                "product_id": product_id,
+                "quantity": quantity,
+                "price": products[product_id].price,
+            })
+
+    db.flush()
+    if new_rows:
+        # One executemany INSERT for all new lines
+        db.execute(insert(models_cart.OrderItem), new_rows)
+
+    items = db.query(models_cart.OrderItem).filter(
+        models_cart.OrderItem.order_id == order.id,
+        models_cart.OrderItem.product_id.in_(quantities.keys())
+    ).all()
+    # Snapshot before commit, otherwise every item would be reloaded one by one after it
+    result = [schemas_cart.CartItem.model_validate(item, from_attributes=True) for item in items]
+    db.commit()
+    return result
+
+
 def update_order_status(db: Session, order_id: int, new_status: str):
     db_order = get_order(db, order_id)
     if db_order:
@@ -2,7 +2,9 @@ from sqlalchemy.orm import Session
 from app.models import category as models_category
 from app.models import product as models_product 
 from app.schemas import category as schemas_category
-from typing import List
+from typing import List, Optional
+from app.utils.pagination import paginate_by_id
+from app.utils.cache import category_cache
 
 def get_category(db: Session, category_id: int):
     return db.query(models_category.Category).filter(models_category.Category.id == category_id).first()
@@ -10,6 +12,12 @@ def get_category(db: Session, category_id: int):
 def get_categories(db: Session):
     return db.query(models_category.Category).all()
 
+def get_categories_cached(db: Session):
+    """All categories as schemas.Category, cached as a single list until a category is created."""
+    return category_cache.get_or_load(
+        "all", lambda: [schemas_category.Category.model_validate(c) for c in get_categories(db)]
+    )
+
 def get_category_by_name(db: Session, name: str):
     return db.query(models_category.Category).filter(models_category.Category.name == name).first()
 
@@ -20,6 +28,7 @@ def create_category(db: Session, category: schemas_category.CategoryCreate):
     )
     db.add(db_category)
     db.commit()
+    category_cache.clear()
     db.refresh(db_category)
     return db_category
 
@@ -28,3 +37,8 @@ def get_products_in_category(db: Session, category_id: int, skip: int = 0, limit
         models_product.Product.category_id == category_id
     ).offset(skip).limit(limit).all()
 
+def get_products_in_category_page(db: Session, category_id: int, after: Optional[str] = None, limit: int = 100):
+    query = db.query(models_product.Product).filter(
+        models_product.Product.category_id == category_id
+    )
+    return paginate_by_id(query, models_product.Product.id, after, limit)
@@ -0,0 +1,157 @@
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+from app.models import email_job as models_email_job
+
+EmailJob = models_email_job.EmailJob
+
+
+def enqueue_email(db: Session, recipient: str, subject: str, body: str, kind: str = "generic", commit: bool = True):
+    # commit=False adds the job to the caller's transaction, committed along with its other writes
+    now = datetime.utcnow()
+    db_job = EmailJob(
+        kind=kind,
+        recipient=recipient,
+        subject=subject,
+        body=body,
+        status="pending",
+        attempts=0,
+        next_attempt_at=now,
+        # Set here rather than by the server default, which is whole seconds on SQLite
+        created_at=now,
+    )
+    db.add(db_job)
+    if commit:
+        db.commit()
+        db.refresh(db_job)
+    else:
+        db.flush()
+    return db_job
+
+
+def requeue_stale_jobs(db: Session, lock_timeout: float) -> int:
+    """Hand jobs claimed by a worker that died mid-batch back to the queue"""
+    cutoff = datetime.utcnow() - timedelta(seconds=lock_timeout)
+    result = db.execute(
+        update(EmailJob)
+        .where(EmailJob.status == "sending", EmailJob.locked_at < cutoff)
+        .values(status="pending", locked_by=None, locked_at=None)
+    )
+    db.commit()
+    return result.rowcount
+
+
+def claim_due_jobs(db: Session, worker_id: str, limit: int) -> List[dict]:
+    """
+    Mark up to `limit` due jobs as sending for `worker_id` and return them as plain dicts.
+
+    The UPDATE only takes rows that are still pending, so two workers (or two
+    app processes) polling at once never claim the same job.
+    """
+    now = datetime.utcnow()
+    query = db.query(EmailJob.id).filter(
+        EmailJob.status == "pending", EmailJob.next_attempt_at <= now
+    ).order_by(EmailJob.next_attempt_at, EmailJob.id).limit(limit)
+    if db.get_bind().dialect.name == "postgresql":
+        query = query.with_for_update(skip_locked=True)
+    ids = [row[0] for row in query.all()]
+    if not ids:
+        db.commit()
+        return []
+
+    db.execute(
+        update(EmailJob)
+        .where(EmailJob.id.in_(ids), EmailJob.status == "pending")
+        .values(status="sending", locked_by=worker_id, locked_at=now)
+    )
+    jobs = db.query(EmailJob).filter(
+        EmailJob.id.in_(ids), EmailJob.status == "sending", EmailJob.locked_by == worker_id
+    ).order_by(EmailJob.id).all()
+    claimed = [
+        {
+            "id": job.id,
+            "kind": job.kind,
+            "recipient": job.recipient,
+            "subject": job.subject,
+            "body": job.body,
+            "attempts": job.attempts,
+            "created_at": job.created_at,
+        }
+        for job in jobs
+    ]
+    db.commit()
+    return claimed
+
+
+def renew_claims(db: Session, worker_id: str, job_ids: List[int]) -> Set[int]:
+    """
+    Push back the lock timeout of jobs `worker_id` is still sending and return
+    the ids it holds; the others were requeued and may belong to another worker.
+    """
+    db.execute(
+        update(EmailJob)
+        .where(EmailJob.id.in_(job_ids), EmailJob.status == "sending", EmailJob.locked_by == worker_id)
+        .values(locked_at=datetime.utcnow())
+    )
+    held = {
+        row[0] for row in db.query(EmailJob.id).filter(
+            EmailJob.id.in_(job_ids), EmailJob.status == "sending", EmailJob.locked_by == worker_id
+        )
+    }
+    db.commit()
+    return held
+
+
+def record_results(
+    db: Session,
+    sent_ids: List[int],
+    failures: Dict[int, Tuple[str, Optional[datetime]]],
+):
+    """
+    Store the outcome of a batch.
+
+    `failures` maps job id to (error, retry_at); a retry_at of None gives up on the job.
+    """
+    now = datetime.utcnow()
+    if sent_ids:
+        db.execute(
+            update(EmailJob)
+            .where(EmailJob.id.in_(sent_ids))
+            .values(
+                status="sent",
+                sent_at=now,
+                attempts=EmailJob.attempts + 1,
+                locked_by=None,
+                locked_at=None,
+                last_error=None,
+            )
+        )
+    for job_id, (error, retry_at) in failures.items():
+        db.execute(
+            update(EmailJob)
+            .where(EmailJob.id == job_id)
+            .values(
+                status="failed" if retry_at is None else "pending",
+                next_attempt_at=retry_at or now,
+                attempts=EmailJob.attempts + 1,
+                locked_by=None,
+                locked_at=None,
+                last_error=error[:2000],
+            )
+        )
+    db.commit()
+
+
+def get_queue_counts(db: Session) -> dict:
+    counts = dict(db.query(EmailJob.status, func.count(EmailJob.id)).group_by(EmailJob.status).all())
+    oldest_pending = db.query(func.min(EmailJob.created_at)).filter(EmailJob.status == "pending").scalar()
+    return {
+        "pending": counts.get("pending", 0),
+        "sending": counts.get("sending", 0),
+        "sent": counts.get("sent", 0),
+        "failed": counts.get("failed", 0),
+        "oldest_pending_age_seconds": (
+            round((datetime.utcnow() - oldest_pending).total_seconds(), 3) if oldest_pending else 0.0
+        ),
+    }
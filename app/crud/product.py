@@ -1,16 +1,46 @@
+from fastapi import HTTPException, status
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from typing import Optional
 from app.models import product as models_product
 from app.schemas import product as schemas_product
+from app.utils.pagination import paginate_by_id
+from app.crud import search as search_crud
+from app.utils.cache import product_cache
 
 def get_product(db: Session, product_id: int):
     return db.query(models_product.Product).filter(models_product.Product.id == product_id).first()
 
+def get_product_cached(db: Session, product_id: int):
+    """Read-only snapshot of a product (schemas.Product), served from the in-process cache when possible."""
+    def load():
+        db_product = get_product(db, product_id)
+        return schemas_product.Product.model_validate(db_product) if db_product else None
+
+    return product_cache.get_or_load(product_id, load)
+
 def get_products(db: Session, skip: int = 0, limit: int = 100):
     return db.query(models_product.Product).offset(skip).limit(limit).all()
 
+def get_products_page(db: Session, after: Optional[str] = None, limit: int = 100):
+    return paginate_by_id(db.query(models_product.Product), models_product.Product.id, after, limit)
+
 def get_product_by_title(db: Session, title: str):
     return db.query(models_product.Product).filter(models_product.Product.title == title).first()
 
+def _save(db: Session, db_product: models_product.Product):
+    """Flush, reindex and commit a created or edited product"""
+    try:
+        db.flush()
+        search_crud.index_product(db, db_product)
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        # uq_products_title also catches a title taken after the caller checked it
+        if "title" not in str(e.orig):
+            raise
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Product title already registered")
+
 def create_product(db: Session, product: schemas_product.ProductCreate):
     db_product = models_product.Product(
         title=product.title,
@@ -22,7 +52,8 @@ def create_product(db: Session, product: schemas_product.ProductCreate):
         in_stock=product.in_stock
     )
     db.add(db_product)
-    db.commit()
+    _save(db, db_product)
+    product_cache.delete(db_product.id)
     db.refresh(db_product)
     return db_product
 
@@ -30,18 +61,56 @@ def update_product(db: Session, product_id: int, updated_data: schemas_product.P
     db_product = get_product(db, product_id)
     if db_product:
         update_data_dict = updated_data.dict(exclude_unset=True)
+        if "image_url" in update_data_dict and update_data_dict["image_url"] != db_product.image_url:
+            # Variants of the old image no longer apply, as in set_product_image
+            db_product.thumbnail_url = None
+            db_product.image_variants = None
         for key, value in update_data_dict.items():
             setattr(db_product, key, value)
         
-        db.commit()
+        _save(db, db_product)
+        product_cache.delete(product_id)
         db.refresh(db_product)
         return db_product
     return None
 
+def set_product_image(db: Session, product_id: int, image_url: str):
+    """Point the product at a stored image; returns (product, previous image_url) or (None, None)"""
+    db_product = get_product(db, product_id)
+    if not db_product:
+        return None, None
+    previous = db_product.image_url
+    if previous != image_url:
+        db_product.image_url = image_url
+        # Variants of the old image no longer apply; new ones are recorded once built
+        db_product.thumbnail_url = None
+        db_product.image_variants = None
+    db.commit()
+    product_cache.delete(product_id)
+    db.refresh(db_product)
+    return db_product, previous
+
+def set_product_image_variants(db: Session, product_id: int, image_url: str, thumbnail_url: Optional[str], variants: dict):
+    """Store built variants, unless the product's image was replaced while they were being made"""
+    Product = models_product.Product
+    updated = db.query(Product).filter(Product.id == product_id, Product.image_url == image_url).update(
+        {Product.thumbnail_url: thumbnail_url, Product.image_variants: variants}, synchronize_session=False
+    )
+    db.commit()
+    product_cache.delete(product_id)
+    return updated > 0
+
+def image_in_use(db: Session, image_url: str) -> bool:
+    """Uploads are deduplicated by content, so one stored file can back several products"""
+    Product = models_product.Product
+    return db.query(Product.id).filter(Product.image_url == image_url).first() is not None
+
 def delete_product(db: Session, product_id: int):
     db_product = get_product(db, product_id)
     if db_product:
         db.delete(db_product)
+        search_crud.remove_product(db, product_id)
         db.commit()
+        product_cache.delete(product_id)
         return True
     return False
@@ -0,0 +1,119 @@
+"""
+Streaming catalog export
+
+Rows are read with yield_per, which also asks the driver for a server-side
+cursor where it has one (psycopg2, asyncpg), so only EXPORT_BATCH_SIZE rows are
+held at a time however large the table is. They are selected as plain column
+tuples rather than ORM objects, and every batch becomes one NDJSON or CSV chunk,
+gzipped on the fly when asked.
+"""
+import csv
+import io
+import os
+import zlib
+from datetime import date, datetime
+from typing import Iterable, Iterator, List, Optional, Sequence
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.models.product import Product
+from app.models.category import Category
+from app.utils.fast_json import dumps
+
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 2000))
+EXPORT_GZIP_LEVEL = int(os.getenv("EXPORT_GZIP_LEVEL", 6))
+
+EXPORT_COLUMNS = [
+    Product.id,
+    Product.title,
+    Product.brand,
+    Product.description,
+    Product.price,
+    Product.in_stock,
+    Product.category_id,
+    Product.image_url,
+    Product.thumbnail_url,
+    Product.created_at,
+    Product.updated_at,
+]
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+def export_fields(include_category: bool) -> List[str]:
+    fields = [column.key for column in EXPORT_COLUMNS]
+    if include_category:
+        fields.append("category_name")
+    return fields
+
+
+def export_statement(include_category: bool):
+    statement = select(*EXPORT_COLUMNS)
+    if include_category:
+        statement = statement.add_columns(Category.name.label("category_name")).outerjoin(
+            Category, Product.category_id == Category.id
+        )
+    # Primary key order walks the index and keeps nightly dumps diffable
+    return statement.order_by(Product.id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+class ExportEncoder:
+    """Encodes batches of rows as NDJSON or CSV bytes, through a gzip stream when `compress` is set"""
+
+    def __init__(self, fields: Sequence[str], export_format: str, compress: bool):
+        self.fields = list(fields)
+        self.export_format = export_format
+        # wbits 16 + MAX_WBITS writes a gzip header and trailer around the deflate stream
+        self._gzip = zlib.compressobj(EXPORT_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if compress else None
+
+    def _output(self, data: bytes) -> bytes:
+        return self._gzip.compress(data) if self._gzip is not None else data
+
+    def _csv(self, rows: Iterable[Sequence]) -> bytes:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue().encode("utf-8")
+
+    def header(self) -> bytes:
+        if self.export_format == "csv":
+            return self._output(self._csv([self.fields]))
+        return b""
+
+    def encode(self, rows: Iterable[Sequence]) -> bytes:
+        if self.export_format == "csv":
+            return self._output(self._csv([_csv_value(value) for value in row] for row in rows))
+        return self._output(b"".join(dumps(dict(zip(self.fields, row))) + b"\n" for row in rows))
+
+    def finish(self) -> bytes:
+        return self._gzip.flush() if self._gzip is not None else b""
+
+
+def iter_export(db: Session, export_format: str, include_category: bool = False, compress: bool = False) -> Iterator[bytes]:
+    """Chunks of the whole catalog; iterate it from a StreamingResponse so the session stays open"""
+    encoder = ExportEncoder(export_fields(include_category), export_format, compress)
+    header = encoder.header()
+    if header:
+        yield header
+    result = db.execute(export_statement(include_category))
+    try:
+        for rows in result.partitions():
+            chunk = encoder.encode(rows)
+            # gzip buffers small inputs and may have nothing to emit yet
+            if chunk:
+                yield chunk
+    finally:
+        result.close()
+    yield encoder.finish()
+
+
+def export_filename(export_format: str, today: Optional[date] = None) -> str:
+    return f"products-{(today or date.today()).isoformat()}.{export_format}"
@@ -0,0 +1,181 @@
+"""
+Faceted product filtering
+
+Filters are exact matches (brand, category_id, in_stock) plus a price range, so
+every combination can seek into one of the composite indexes on Product. Pages
+are keyset paginated on the sort key with the id as tie-breaker.
+
+Facet counts come from a single UNION ALL of GROUP BYs. Each facet applies every
+filter except its own, so the brand counts still list the other brands the
+client could switch to.
+"""
+import os
+from decimal import Decimal, InvalidOperation
+from typing import Dict, List, Optional, Sequence
+from fastapi import HTTPException, status
+from sqlalchemy import String, and_, case, cast, func, literal, or_, select, union_all
+from sqlalchemy.orm import Session
+from app.models.product import Product
+from app.models.category import Category
+from app.utils.pagination import decode_cursor, encode_cursor
+
+
+def _parse_buckets(value: str) -> List[Decimal]:
+    return sorted(Decimal(bound.strip()) for bound in value.split(",") if bound.strip())
+
+
+# Upper bounds of the price facet's ranges; one more range holds everything above the last
+PRODUCT_PRICE_BUCKETS = _parse_buckets(os.getenv("PRODUCT_PRICE_BUCKETS", "25,50,100,250,500,1000"))
+
+# sort name -> (column, descending); ties are broken by id in the same direction
+SORTS = {
+    "id": (Product.id, False),
+    "-id": (Product.id, True),
+    "price": (Product.price, False),
+    "-price": (Product.price, True),
+    "title": (Product.title, False),
+    "-title": (Product.title, True),
+}
+
+
+def _conditions(
+    brand: Optional[Sequence[str]] = None,
+    category_id: Optional[Sequence[int]] = None,
+    category: Optional[str] = None,
+    min_price: Optional[Decimal] = None,
+    max_price: Optional[Decimal] = None,
+    in_stock: Optional[bool] = None,
+) -> Dict[str, list]:
+    """WHERE clauses grouped by the facet they belong to"""
+    conditions = {"brand": [], "category": [], "price": [], "in_stock": []}
+    if brand:
+        conditions["brand"].append(Product.brand.in_(list(brand)))
+    if category_id:
+        conditions["category"].append(Product.category_id.in_(list(category_id)))
+    if category:
+        # Name search kept for existing clients; category_id is the indexed path
+        conditions["category"].append(Product.category.has(Category.name.ilike(f"%{category}%")))
+    if min_price is not None:
+        conditions["price"].append(Product.price >= min_price)
+    if max_price is not None:
+        conditions["price"].append(Product.price <= max_price)
+    if in_stock is not None:
+        conditions["in_stock"].append(Product.in_stock == in_stock)
+    return conditions
+
+
+def _all_except(conditions: Dict[str, list], facet: Optional[str] = None) -> list:
+    return [clause for name, clauses in conditions.items() if name != facet for clause in clauses]
+
+
+def _invalid_cursor() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Invalid pagination cursor"
+    )
+
+
+def _after_clause(sort: str, after: str):
+    column, descending = SORTS[sort]
+    values = decode_cursor(after)
+    last_id = values.get("id")
+    if not isinstance(last_id, int) or values.get("sort") != sort:
+        raise _invalid_cursor()
+    if column is Product.id:
+        return Product.id < last_id if descending else Product.id > last_id
+
+    last_value = values.get("value")
+    if not isinstance(last_value, str):
+        raise _invalid_cursor()
+    if column is Product.price:
+        try:
+            last_value = Decimal(last_value)
+        except InvalidOperation:
+            raise _invalid_cursor()
+    if descending:
+        return or_(column < last_value, and_(column == last_value, Product.id < last_id))
+    return or_(column > last_value, and_(column == last_value, Product.id > last_id))
+
+
+def _cursor_for(sort: str, product: Product) -> str:
+    column, _ = SORTS[sort]
+    values = {"sort": sort, "id": product.id}
+    if column is not Product.id:
+        values["value"] = str(getattr(product, column.key))
+    return encode_cursor(values)
+
+
+def _price_bucket():
+    if not PRODUCT_PRICE_BUCKETS:
+        return literal(0)
+    return case(
+        *[(Product.price < bound, index) for index, bound in enumerate(PRODUCT_PRICE_BUCKETS)],
+        else_=len(PRODUCT_PRICE_BUCKETS),
+    )
+
+
+def _price_range(index: int) -> dict:
+    return {
+        "min_price": PRODUCT_PRICE_BUCKETS[index - 1] if index > 0 else None,
+        "max_price": PRODUCT_PRICE_BUCKETS[index] if index < len(PRODUCT_PRICE_BUCKETS) else None,
+    }
+
+
+def get_facets(db: Session, conditions: Dict[str, list]) -> dict:
+    """Per-brand, per-category and per-price-range counts in one round trip"""
+    bucket = _price_bucket()
+    facets = union_all(
+        select(literal("brand").label("facet"), cast(Product.brand, String).label("value"), func.count().label("count"))
+        .where(*_all_except(conditions, "brand"))
+        .group_by(Product.brand),
+        select(literal("category"), cast(Product.category_id, String), func.count())
+        .where(*_all_except(conditions, "category"))
+        .group_by(Product.category_id),
+        select(literal("price"), cast(bucket, String), func.count())
+        .where(*_all_except(conditions, "price"))
+        .group_by(bucket),
+    )
+
+    result = {"brands": [], "categories": [], "price_ranges": []}
+    for facet, value, count in db.execute(facets):
+        if facet == "brand":
+            result["brands"].append({"brand": value, "count": count})
+        elif facet == "category":
+            result["categories"].append({"category_id": int(value) if value is not None else None, "count": count})
+        else:
+            result["price_ranges"].append(dict(_price_range(int(value)), count=count))
+    result["brands"].sort(key=lambda item: (-item["count"], item["brand"] or ""))
+    result["categories"].sort(key=lambda item: (-item["count"], item["category_id"] or 0))
+    result["price_ranges"].sort(key=lambda item: item["min_price"] or Decimal(0))
+    return result
+
+
+def filter_products(
+    db: Session,
+    sort: str = "id",
+    after: Optional[str] = None,
+    limit: int = 20,
+    facets: bool = True,
+    **filters,
+):
+    """One page of products matching `filters` in `sort` order, its next cursor and the facet counts"""
+    conditions = _conditions(**filters)
+    column, descending = SORTS[sort]
+    query = db.query(Product).filter(*_all_except(conditions))
+    if after:
+        query = query.filter(_after_clause(sort, after))
+    order = [column.desc(), Product.id.desc()] if descending else [column.asc(), Product.id.asc()]
+    if column is Product.id:
+        order = order[1:]
+
+    # Fetch one extra row to learn whether another page exists
+    rows = query.order_by(*order).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _cursor_for(sort, rows[-1])
+    return {
+        "items": rows,
+        "next_cursor": next_cursor,
+        "facets": get_facets(db, conditions) if facets else None,
+    }
@@ -0,0 +1,309 @@
+"""
+Bulk catalog import
+
+Products are matched by title: new titles are inserted, known ones updated, all
+through INSERT ... ON CONFLICT (title) DO UPDATE. Input is CSV or NDJSON
+(optionally gzipped) read line by line, so a feed of any size is never held in
+memory; uploads are spooled to a temporary file by Starlette first.
+
+Every IMPORT_BATCH_SIZE rows are validated together, their category names are
+resolved against the category list (read from the database once per import, not
+from the per-worker cache, so categories just created elsewhere are found),
+and the valid ones are written as a single multi-row upsert and committed in
+one transaction with their full-text index rows.
+
+Bad rows are reported with their line number and skipped. An image_url must be
+an http(s) URL or one of our own uploads. If the database still rejects a batch, it is split in halves and retried until the offending rows are
+isolated, so the rest of the batch is written anyway.
+
+    python -m app.crud.product_import products.csv [more files...]
+"""
+import csv
+import gzip
+import io
+import itertools
+import json
+import os
+import sys
+from decimal import Decimal
+from typing import BinaryIO, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+from fastapi import HTTPException, status
+from pydantic import ValidationError
+from sqlalchemy import case, func, inspect, null, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.orm import Session
+from app.models.product import Product
+from app.crud import category as category_crud
+from app.crud import search as search_crud
+from app.schemas.product import ProductImportRow
+from app.utils.cache import product_cache
+from app.utils.file_handler import upload_key
+
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", 5000))
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", 100))
+
+# Dialects with INSERT ... ON CONFLICT
+INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+# (line number, record, error reading it)
+Record = Tuple[int, Optional[dict], Optional[str]]
+
+
+def import_format_for(filename: Optional[str]) -> str:
+    """csv for .csv/.csv.gz files, ndjson otherwise"""
+    name = (filename or "").lower()
+    if name.endswith(".gz"):
+        name = name[:-3]
+    return "csv" if name.endswith(".csv") else "ndjson"
+
+
+def upsert_statement(dialect_name: str):
+    insert = INSERTS.get(dialect_name)
+    if insert is None:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail=f"Bulk import needs INSERT ... ON CONFLICT, which {dialect_name} does not support"
+        )
+    products = Product.__table__
+    statement = insert(products)
+    excluded = statement.excluded
+    image_url = func.coalesce(excluded.image_url, products.c.image_url)
+    # Variants were built from the old image
+    image_replaced = products.c.image_url.is_distinct_from(image_url)
+    return statement.on_conflict_do_update(
+        index_elements=[products.c.title],
+        set_={
+            "price": excluded.price,
+            "category_id": excluded.category_id,
+            # Columns the feed leaves empty keep their current value
+            "in_stock": func.coalesce(excluded.in_stock, products.c.in_stock),
+            "description": func.coalesce(excluded.description, products.c.description),
+            "brand": func.coalesce(excluded.brand, products.c.brand),
+            "image_url": image_url,
+            "thumbnail_url": case((image_replaced, null()), else_=products.c.thumbnail_url),
+            "image_variants": case((image_replaced, null()), else_=products.c.image_variants),
+            # onupdate defaults don't apply to ON CONFLICT
+            "updated_at": func.now(),
+        },
+    ).returning(products.c.id)
+
+
+def require_unique_titles(db: Session):
+    """Refuse to import unless products.title has the unique index ON CONFLICT (title) needs"""
+    inspector = inspect(db.connection())
+    unique = [index["column_names"] for index in inspector.get_indexes("products") if index["unique"]]
+    unique += [constraint["column_names"] for constraint in inspector.get_unique_constraints("products")]
+    if ["title"] not in unique:
+        # Without it every batch fails, and bisecting would report each row on its own
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Bulk import matches products by title, but products.title has no unique index. "
+                   "Remove the duplicate titles, then restart the app to create uq_products_title"
+        )
+
+
+def valid_image_url(url: str) -> bool:
+    """An absolute http(s) URL or one of our own uploads; product deletion only removes the latter"""
+    parts = urlsplit(url)
+    if parts.scheme in ("http", "https") and parts.netloc:
+        return True
+    return upload_key(url) is not None
+
+
+def open_feed(stream: BinaryIO):
+    """Text reader over a binary upload, gunzipping it when it starts with the gzip magic"""
+    magic = stream.read(2)
+    stream.seek(0)
+    if magic == b"\x1f\x8b":
+        stream = gzip.GzipFile(fileobj=stream, mode="rb")
+    # utf-8-sig drops the BOM spreadsheets put in front of CSV exports
+    return io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+
+
+def iter_records(text: io.TextIOBase, import_format: str) -> Iterator[Record]:
+    if import_format == "csv":
+        reader = csv.DictReader(text)
+        for record in reader:
+            # Empty cells fall back to the column defaults; cells beyond the header are dropped
+            yield reader.line_num, {
+                key: value.strip() for key, value in record.items()
+                if key and isinstance(value, str) and value.strip()
+            }, None
+        return
+
+    for line_number, line in enumerate(text, 1):
+        if not line.strip():
+            continue
+        try:
+            # Decimal keeps prices exact
+            record = json.loads(line, parse_float=Decimal)
+        except ValueError as e:
+            yield line_number, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield line_number, None, "Expected a JSON object"
+            continue
+        yield line_number, record, None
+
+
+def _describe(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in detail['loc']) or 'row'}: {detail['msg']}" for detail in error.errors()
+    )
+
+
+class ProductImporter:
+    """
+    Import state shared by the sync and async entry points: read_batch is pure
+    Python (parsing and validation), write_batch is the database work.
+    """
+
+    def __init__(self, categories: Sequence, dialect_name: str):
+        self.category_ids = {category.id for category in categories}
+        self.category_names = {category.name.casefold(): category.id for category in categories}
+        self.statement = upsert_statement(dialect_name)
+        self.result = {"rows": 0, "inserted": 0, "updated": 0, "duplicates": 0, "failed": 0, "errors": []}
+
+    def error(self, line: int, message: str, title: Optional[str] = None):
+        self.result["failed"] += 1
+        if len(self.result["errors"]) < IMPORT_MAX_ERRORS:
+            self.result["errors"].append({"line": line, "title": title, "message": message})
+
+    def records(self, stream: BinaryIO, import_format: str) -> Iterator[Record]:
+        """iter_records over the upload; unreadable input ends the import as an error on the next line"""
+        line = 0
+        try:
+            for line, record, message in iter_records(open_feed(stream), import_format):
+                yield line, record, message
+        except (UnicodeDecodeError, csv.Error, OSError, EOFError) as e:
+            yield line + 1, None, f"Unreadable input, import stopped: {e}"
+
+    def _validate(self, line: int, record: dict) -> Optional[dict]:
+        title = record.get("title")
+        title = title if isinstance(title, str) else None
+        try:
+            row = ProductImportRow.model_validate(record)
+        except ValidationError as e:
+            self.error(line, _describe(e), title)
+            return None
+
+        category_id = row.category_id
+        if category_id is None and row.category:
+            category_id = self.category_names.get(row.category.strip().casefold())
+            if category_id is None:
+                self.error(line, f"Unknown category '{row.category}'", row.title)
+                return None
+        if category_id is None:
+            self.error(line, "category_id or category is required", row.title)
+            return None
+        if category_id not in self.category_ids:
+            self.error(line, f"Category {category_id} does not exist", row.title)
+            return None
+        if row.image_url is not None and not valid_image_url(row.image_url):
+            self.error(line, "image_url must be an http(s) URL or an uploaded image", row.title)
+            return None
+        return {
+            "title": row.title,
+            "description": row.description,
+            "price": row.price,
+            "brand": row.brand,
+            "image_url": row.image_url,
+            "in_stock": row.in_stock,
+            "category_id": category_id,
+        }
+
+    def read_batch(self, records: Iterator[Record]) -> Optional[List[Tuple[int, dict]]]:
+        """The next IMPORT_BATCH_SIZE records validated as (line, row) pairs; None once the input is exhausted"""
+        chunk = list(itertools.islice(records, IMPORT_BATCH_SIZE))
+        if not chunk:
+            return None
+        rows = {}
+        for line, record, message in chunk:
+            self.result["rows"] += 1
+            if message is not None:
+                self.error(line, message)
+                continue
+            row = self._validate(line, record)
+            if row is None:
+                continue
+            # One statement can't update the same row twice; the later row wins
+            if row["title"] in rows:
+                self.result["duplicates"] += 1
+            rows[row["title"]] = (line, row)
+        return list(rows.values())
+
+    def write_batch(self, db: Session, batch: List[Tuple[int, dict]]):
+        """Upsert `batch` in one transaction, bisecting it to isolate rows the database rejects"""
+        if not batch:
+            return
+        rows = [row for _, row in batch]
+        try:
+            existing = db.execute(
+                select(func.count()).select_from(Product).where(Product.title.in_([row["title"] for row in rows]))
+            ).scalar()
+            product_ids = db.execute(self.statement, rows).scalars().all()
+            # Only rows inserted without an in_stock value are still NULL; new products default to in stock
+            db.execute(
+                update(Product).where(Product.id.in_(product_ids), Product.in_stock.is_(None)).values(in_stock=True)
+            )
+            search_crud.index_products(db, product_ids)
+            db.commit()
+        except (IntegrityError, DataError) as e:
+            db.rollback()
+            if len(batch) == 1:
+                line, row = batch[0]
+                self.error(line, str(e.orig), row["title"])
+                return
+            middle = len(batch) // 2
+            self.write_batch(db, batch[:middle])
+            self.write_batch(db, batch[middle:])
+            return
+        self.result["inserted"] += len(rows) - existing
+        self.result["updated"] += existing
+        product_cache.clear()
+
+
+def import_products(db: Session, stream: BinaryIO, import_format: str) -> dict:
+    """Create or update products by title from a CSV/NDJSON file object"""
+    require_unique_titles(db)
+    importer = ProductImporter(category_crud.get_categories(db), db.get_bind().dialect.name)
+    records = importer.records(stream, import_format)
+    while True:
+        batch = importer.read_batch(records)
+        if batch is None:
+            break
+        importer.write_batch(db, batch)
+    return importer.result
+
+
+def _main(paths: List[str]):
+    from database import SessionLocal, engine, ensure_schema
+
+    # Same start-up steps as the app: the unique title index and the FTS table
+    ensure_schema(engine)
+    search_crud.ensure_search_index(engine)
+    db = SessionLocal()
+    try:
+        for path in paths:
+            with open(path, "rb") as stream:
+                try:
+                    result = import_products(db, stream, import_format_for(path))
+                except HTTPException as e:
+                    sys.exit(e.detail)
+            print(
+                f"{path}: {result['rows']} rows, {result['inserted']} inserted, {result['updated']} updated, "
+                f"{result['duplicates']} duplicates, {result['failed']} failed"
+            )
+            for error in result["errors"]:
+                print(f"  line {error['line']}: {error['message']}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit("usage: python -m app.crud.product_import FILE [FILE...]")
+    _main(sys.argv[1:])
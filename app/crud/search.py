@@ -0,0 +1,134 @@
+import re
+from typing import List
+from sqlalchemy import bindparam, text, or_
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from app.models import product as models_product
+
+FTS_TABLE = "products_fts"
+PG_TSVECTOR = "to_tsvector('english', coalesce(title, '') || ' ' || coalesce(description, ''))"
+
+# Set by ensure_search_index(); search falls back to ILIKE while False
+fts_enabled = False
+
+
+def _dialect(bind) -> str:
+    return bind.dialect.name
+
+
+def _tokens(q: str):
+    return re.findall(r"\w+", q.lower())
+
+
+def ensure_search_index(engine):
+    """Create the full-text index for products if the database supports one."""
+    global fts_enabled
+    dialect = _dialect(engine)
+
+    try:
+        with engine.begin() as conn:
+            if dialect == "sqlite":
+                exists = conn.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                    {"name": FTS_TABLE},
+                ).first()
+                if not exists:
+                    conn.execute(text(
+                        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                        "title, description, tokenize = 'unicode61 remove_diacritics 2')"
+                    ))
+                    conn.execute(text(
+                        f"INSERT INTO {FTS_TABLE} (rowid, title, description) "
+                        "SELECT id, title, coalesce(description, '') FROM products"
+                    ))
+            elif dialect == "postgresql":
+                conn.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS ix_products_fts ON products USING GIN ({PG_TSVECTOR})"
+                ))
+            else:
+                fts_enabled = False
+                return
+        fts_enabled = True
+    except OperationalError as e:
+        # e.g. SQLite built without FTS5
+        print(f"Full-text search unavailable, falling back to LIKE: {e}")
+        fts_enabled = False
+
+
+def index_product(db: Session, product: models_product.Product):
+    """Write the product's searchable text to the FTS table (SQLite only, Postgres indexes itself)."""
+    if not fts_enabled or _dialect(db.get_bind()) != "sqlite":
+        return
+    db.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {"id": product.id})
+    db.execute(
+        text(f"INSERT INTO {FTS_TABLE} (rowid, title, description) VALUES (:id, :title, :description)"),
+        {"id": product.id, "title": product.title, "description": product.description or ""},
+    )
+
+
+def index_products(db: Session, product_ids: List[int]):
+    """index_product for many rows at once, reading their text straight from the products table"""
+    if not product_ids or not fts_enabled or _dialect(db.get_bind()) != "sqlite":
+        return
+    ids = bindparam("ids", expanding=True)
+    db.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid IN :ids").bindparams(ids), {"ids": product_ids})
+    db.execute(
+        text(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, description) "
+            "SELECT id, title, coalesce(description, '') FROM products WHERE id IN :ids"
+        ).bindparams(ids),
+        {"ids": product_ids},
+    )
+
+
+def remove_product(db: Session, product_id: int):
+    if not fts_enabled or _dialect(db.get_bind()) != "sqlite":
+        return
+    db.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {"id": product_id})
+
+
+def search_products(db: Session, q: str, skip: int = 0, limit: int = 20):
+    """
+    Ranked, prefix-matching product search.
+
+    Every word of `q` must match the start of a word in the title or description.
+    Results are ordered by relevance (bm25 on SQLite, ts_rank on Postgres).
+    """
+    Product = models_product.Product
+    tokens = _tokens(q)
+    if not tokens:
+        return []
+
+    dialect = _dialect(db.get_bind())
+    if fts_enabled and dialect == "sqlite":
+        match = " ".join(f'"{token}"*' for token in tokens)
+        rows = db.execute(
+            text(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match "
+                f"ORDER BY bm25({FTS_TABLE}) LIMIT :limit OFFSET :skip"
+            ),
+            {"match": match, "limit": limit, "skip": skip},
+        )
+    elif fts_enabled and dialect == "postgresql":
+        tsquery = " & ".join(f"{token}:*" for token in tokens)
+        rows = db.execute(
+            text(
+                f"SELECT id FROM products WHERE {PG_TSVECTOR} @@ to_tsquery('english', :tsquery) "
+                f"ORDER BY ts_rank({PG_TSVECTOR}, to_tsquery('english', :tsquery)) DESC, id "
+                "LIMIT :limit OFFSET :skip"
+            ),
+            {"tsquery": tsquery, "limit": limit, "skip": skip},
+        )
+    else:
+        return db.query(Product).filter(
+            or_(
+                Product.title.ilike(f"%{q}%"),
+                Product.description.ilike(f"%{q}%")
+            )
+        ).order_by(Product.id).offset(skip).limit(limit).all()
+
+    ids = [row[0] for row in rows]
+    if not ids:
+        return []
+    products = {p.id: p for p in db.query(Product).filter(Product.id.in_(ids)).all()}
+    return [products[i] for i in ids if i in products]
@@ -1,17 +1,17 @@
 from sqlalchemy.orm import Session
-from passlib.context import CryptContext
 from app.models import user as models_user
 from app.schemas import user as schemas_user
 import secrets
 from datetime import datetime, timedelta
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from typing import Optional
+from app.utils.password_hashing import pwd_context, hash_password_sync, verify_password_sync
+from app.utils.email_queue import queue_verification_email, wake_workers
 
 def get_password_hash(password: str):
-    return pwd_context.hash(password)
+    return hash_password_sync(password)
 
 def verify_password(plain_password: str, hashed_password: str):
-    return pwd_context.verify(plain_password, hashed_password)
+    return verify_password_sync(plain_password, hashed_password)
 
 def get_user(db: Session, user_id: int):
     return db.query(models_user.User).filter(models_user.User.id == user_id).first()
@@ -19,8 +19,9 @@ def get_user(db: Session, user_id: int):
 def get_user_by_email(db: Session, email: str):
     return db.query(models_user.User).filter(models_user.User.email == email).first()
 
-def create_user(db: Session, user: schemas_user.UserCreate):
-    hashed_password = get_password_hash(user.password)
+def create_user(db: Session, user: schemas_user.UserCreate, hashed_password: Optional[str] = None):
+    # Callers that hashed on the password pool pass the result in
+    hashed_password = hashed_password or get_password_hash(user.password)
     verification_token = str(secrets.randbelow(1000000)).zfill(6)  
     
     db_user = models_user.User(
@@ -31,7 +32,10 @@ def create_user(db: Session, user: schemas_user.UserCreate):
         verification_token=verification_token
     )
     db.add(db_user)
+    # Same transaction as the user: no account is ever left without its verification email
+    queue_verification_email(db, user.email, verification_token, commit=False)
     db.commit()
+    wake_workers()
     db.refresh(db_user)
     return db_user, verification_token
 
@@ -76,15 +80,23 @@ def create_password_reset_token(db: Session, email: str):
     db.refresh(user)
     return reset_token
 
-def reset_password(db: Session, token: str, new_password: str):
+def get_user_by_reset_token(db: Session, token: str):
+    """The user holding `token`, if it has not expired; check it before hashing the new password"""
     user = db.query(models_user.User).filter(
         models_user.User.reset_token == token
     ).first()
-    
+
     if not user or user.reset_token_expires < datetime.utcnow():
         return None
-    
-    user.hashed_password = get_password_hash(new_password)
+    return user
+
+def reset_password(db: Session, token: str, hashed_password: str):
+    # Callers hash the new password on the password pool (password_hashing.hash_password)
+    user = get_user_by_reset_token(db, token)
+    if not user:
+        return None
+
+    user.hashed_password = hashed_password
     user.reset_token = None
     user.reset_token_expires = None
     db.commit()
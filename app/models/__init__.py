@@ -6,6 +6,7 @@ from .category import Category
 from .product import Product
 from .user import User
 from .cart import Order, OrderItem
+from .email_job import EmailJob
 
 # You can optionally define __all__ if you plan on using 
 # "from app.models import *" in other places, but the imports above 
@@ -15,5 +16,6 @@ __all__ = [
     "Product",
     "User",
     "Order",
-    "OrderItem"
+    "OrderItem",
+    "EmailJob"
 ]
@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index, func
+from database import Base
+
+class EmailJob(Base):
+    __tablename__ = "email_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(50), nullable=False, default="generic")
+    recipient = Column(String(254), nullable=False)
+    subject = Column(String(255), nullable=False)
+    body = Column(Text, nullable=False)
+    # pending -> sending -> sent, or back to pending for a retry, or failed for good
+    status = Column(String(20), nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, server_default=func.now())
+    locked_by = Column(String(64), nullable=True)
+    locked_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+    sent_at = Column(DateTime, nullable=True)
+
+    # Workers poll for due pending jobs in next_attempt_at order
+    __table_args__ = (Index("ix_email_jobs_status_next_attempt", "status", "next_attempt_at"),)
+
+    def __repr__(self):
+        return f"<EmailJob(id={self.id}, recipient='{self.recipient}', status='{self.status}')>"
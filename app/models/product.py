@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DECIMAL, DateTime, func, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DECIMAL, DateTime, JSON, func, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from database import Base 
 
@@ -6,12 +6,15 @@ class Product(Base):
     __tablename__ = "products"
 
     id = Column(Integer, primary_key=True, index=True)
-    category_id = Column(Integer, ForeignKey("categories.id")) 
-    title = Column(String(255), index=True, nullable=False)
+    category_id = Column(Integer, ForeignKey("categories.id"), index=True)
+    title = Column(String(255), nullable=False)
     brand = Column(String(255))
     description = Column(String, default="")
     price = Column(DECIMAL(10, 2), nullable=False) 
     image_url = Column(String) 
+    # Derived from image_url in the background by app.utils.image_variants
+    thumbnail_url = Column(String, nullable=True)
+    image_variants = Column(JSON, nullable=True)
     in_stock = Column(Boolean, default=True)
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, onupdate=func.now())
@@ -21,5 +24,16 @@ class Product(Base):
 
     order_items = relationship("OrderItem", back_populates="product")
 
+    # Back /products/filter/: each exact-match filter followed by the price
+    # range/sort and the id keyset tie-breaker
+    __table_args__ = (
+        Index("ix_products_category_price_id", "category_id", "price", "id"),
+        Index("ix_products_brand_price_id", "brand", "price", "id"),
+        Index("ix_products_in_stock_price_id", "in_stock", "price", "id"),
+        Index("ix_products_price_id", "price", "id"),
+        # Titles identify products in catalog imports (ON CONFLICT (title))
+        Index("uq_products_title", "title", unique=True),
+    )
+
     def __repr__(self):
         return f"<Product(title='{self.title}', price={self.price})>"
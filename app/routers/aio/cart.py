@@ -0,0 +1,193 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
+from app.schemas import cart as cart_schemas
+from app.schemas.checkout import CheckoutRequest, OrderConfirmation
+from app.crud.aio import cart as cart_crud
+from app.crud.aio import product as product_crud
+from app.dependencies import get_current_user
+from app.utils.jwt_utils import TokenData
+from app.routers.cart import AddItemInput
+from datetime import datetime, timedelta 
+from typing import List
+
+router = APIRouter()
+
+@router.post("/add-item/", response_model=cart_schemas.CartItem)
+async def add_item_to_cart(
+    input_data: AddItemInput, 
+    db: AsyncSession = Depends(get_async_db),
+    current_user: TokenData = Depends(get_current_user)
+):
+    
+    if current_user.user_id != input_data.user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You can only add items to your own cart"
+        )
+    
+    product = await product_crud.get_product_cached(db, product_id=input_data.product_id)
+    if not product or not product.in_stock:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found or out of stock")
+    
+    orders_item = await cart_crud.handle_add_to_cart(
+        db=db, 
+        user_id=input_data.user_id,
+        item_details=input_data, 
+        current_price=product.price
+    )
+    return orders_item
+
+
+@router.post("/add-items/", response_model=List[cart_schemas.CartItem])
+async def add_items_to_cart(
+    input_data: cart_schemas.CartItemsBulkCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: TokenData = Depends(get_current_user)
+):
+    
+    if current_user.user_id != input_data.user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You can only add items to your own cart"
+        )
+    
+    return await cart_crud.bulk_add_to_cart(db, user_id=input_data.user_id, lines=input_data.items)
+
+
+@router.put("/update-item/{item_id}")
+async def update_cart_item(
+    item_id: int,
+    quantity: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: TokenData = Depends(get_current_user)
+):
+    
+    cart_item = await cart_crud.get_order_item_with_order(db, item_id=item_id)
+    if not cart_item:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Cart item not found"
+        )
+    
+    order = cart_item.order
+    if order.user_id != current_user.user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You can only modify your own cart items"
+        )
+    
+    if quantity <= 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Quantity must be greater than 0"
+        )
+    
+    product = cart_item.product
+    if not product or not product.in_stock:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Product is out of stock"
+        )
+    
+    cart_item.quantity = quantity
+    await db.commit()
+    await db.refresh(cart_item)
+    
+    return {"message": "Item updated", "item": cart_schemas.CartItem.model_validate(cart_item, from_attributes=True)}
+
+
+@router.delete("/remove-item/{item_id}")
+async def remove_cart_item(
+    item_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: TokenData = Depends(get_current_user)
+):
+    
+    orders_item = await cart_crud.get_order_item_with_order(db, item_id=item_id)
+    if not orders_item:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Cart item not found"
+        )
+    
+    order = orders_item.order
+    if order.user_id != current_user.user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You can only remove items from your own cart"
+        )
+    
+    await db.delete(orders_item)
+    await db.commit()
+    
+    return {"message": "Item removed from cart"}
+
+
+@router.get("/{order_id}/", response_model=cart_schemas.Order)
+async def view_cart_details(
+    order_id: int, 
+    db: AsyncSession = Depends(get_async_db),
+    current_user: TokenData = Depends(get_current_user)
+):
+   
+    order = await cart_crud.get_order_with_items(db, order_id=order_id)
+    if not order:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, 
+            detail="Order (Cart) not found" 
+        )
+    
+    if order.user_id != current_user.user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You can only view your own cart"
+        )
+    
+    return order
+
+
+@router.post("/{order_id}/checkout/", response_model=OrderConfirmation)
+async def process_checkout(
+    order_id: int,
+    checkout_data: CheckoutRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: TokenData = Depends(get_current_user)
+):
+    
+    order = await cart_crud.get_order(db, order_id=order_id)
+    if not order:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Order not found"
+        )
+    
+    if order.user_id != current_user.user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You can only checkout your own order"
+        )
+    
+    if checkout_data.order_id != order_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Order ID mismatch"
+        )
+    
+    updated_order = await cart_crud.update_order_status(db, order_id=order_id, new_status="Processing")
+    
+    if not updated_order:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, 
+            detail="Could not process checkout"
+        )
+    
+    estimated_delivery = (datetime.utcnow() + timedelta(days=6)).strftime("%Y-%m-%d")
+    
+    return OrderConfirmation(
+        order_id=order_id,
+        status="Processing",
+        shipping_address=checkout_data.shipping_address,
+        estimated_delivery=estimated_delivery,
+        tracking_number=f"TRACK-{order_id}-{datetime.utcnow().strftime('%Y%m%d')}"
+    )
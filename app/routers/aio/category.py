@@ -0,0 +1,78 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Union
+
+from database import get_async_db, get_async_read_db
+from app.schemas import category as category_schemas
+from app.crud.aio import category as category_crud
+from app.utils.conditional import compute_etag, conditional_response
+from app.utils.fast_json import dump_rows, dumps, encoded_json_response, fast_json_enabled, fast_json_response
+from app.schemas import product as product_schemas 
+router = APIRouter()
+# Lists skip response_model validation and go out through orjson (FAST_JSON_ROUTERS)
+FAST_JSON = fast_json_enabled("categories")
+
+@router.get("/", response_model=List[category_schemas.Category])
+async def list_categories(request: Request, response: Response, db: AsyncSession = Depends(get_async_read_db)):
+   
+    categories = await category_crud.get_categories_cached(db)
+    etag = compute_etag(*(category.model_dump_json() for category in categories))
+    not_modified = conditional_response(request, response, etag)
+    if not_modified:
+        return not_modified
+    if FAST_JSON:
+        # Cached schema snapshots, already validated when they were loaded
+        return fast_json_response(categories, response)
+    return categories
+
+@router.post("/", response_model=category_schemas.Category, status_code=status.HTTP_201_CREATED)
+async def create_new_category(category: category_schemas.CategoryCreate, db: AsyncSession = Depends(get_async_db)):
+   
+    db_category = await category_crud.get_category_by_name(db, name=category.name)
+    if db_category:
+        raise HTTPException(status_code=400, detail="Category name already registered")
+    return await category_crud.create_category(db=db, category=category)
+
+@router.get("/{category_id}", response_model=category_schemas.Category)
+async def get_category_details(category_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_async_read_db)):
+   
+    category = await category_crud.get_category(db, category_id=category_id)
+    if not category:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Category not found")
+
+    not_modified = conditional_response(request, response, compute_etag(category.id, category.name, category.slug))
+    if not_modified:
+        return not_modified
+    return category
+
+@router.get("/{category_id}/products/", response_model=Union[List[product_schemas.Product], product_schemas.ProductPage])
+async def list_products_by_category(
+    category_id: int,
+    request: Request,
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: bool = Query(False, description="Use keyset pagination and return a page with next_cursor"),
+    after: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    if cursor or after:
+        items, next_cursor = await category_crud.get_products_in_category_page(
+            db, category_id=category_id, after=after, limit=limit
+        )
+        if not items and not after:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Category or products not found")
+        content = {"items": dump_rows(items, product_schemas.Product), "next_cursor": next_cursor}
+    else:
+        items = await category_crud.get_products_in_category(db, category_id=category_id, skip=skip, limit=limit)
+        if not items:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Category or products not found")
+        content = dump_rows(items, product_schemas.Product)
+
+    # The ETag covers the page actually served, so any write that changes it is seen
+    body = dumps(content)
+    not_modified = conditional_response(request, response, compute_etag(body))
+    if not_modified:
+        return not_modified
+    # Already encoded from the schema's fields for the ETag; don't serialize it a second time
+    return encoded_json_response(body, response)
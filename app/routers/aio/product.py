@@ -0,0 +1,206 @@
+from decimal import Decimal
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, Query, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Union
+from database import get_async_db, get_async_read_db
+from app.schemas import product as product_schemas
+from app.crud.aio import product as product_crud
+from app.crud.aio import category as category_crud
+from app.crud.aio import search as search_crud
+from app.crud.aio import product_filter as product_filter_crud
+from app.crud.aio import product_export as product_export_crud
+from app.crud.aio import product_import as product_import_crud
+from app.crud.product_export import MEDIA_TYPES, export_filename
+from app.crud.product_import import import_format_for
+from app.utils.conditional import compute_etag, conditional_response
+from app.utils.fast_json import dump_rows, dumps, encoded_json_response, fast_json_enabled, fast_json_response
+from app.utils.file_handler import save_product_image, delete_product_image, upload_key
+from app.utils.image_variants import schedule_variants
+
+
+router = APIRouter()
+# Lists skip response_model validation and go out through orjson (FAST_JSON_ROUTERS)
+FAST_JSON = fast_json_enabled("products")
+
+@router.get("/", response_model=Union[List[product_schemas.Product], product_schemas.ProductPage])
+async def list_products(
+    request: Request,
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: bool = Query(False, description="Use keyset pagination and return a page with next_cursor"),
+    after: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    if cursor or after:
+        items, next_cursor = await product_crud.get_products_page(db, after=after, limit=limit)
+        content = {"items": dump_rows(items, product_schemas.Product), "next_cursor": next_cursor}
+    else:
+        items = await product_crud.get_products(db, skip=skip, limit=limit)
+        content = dump_rows(items, product_schemas.Product)
+
+    # The ETag covers the page actually served, so any write that changes it is seen
+    body = dumps(content)
+    not_modified = conditional_response(request, response, compute_etag(body))
+    if not_modified:
+        return not_modified
+    # Already encoded from the schema's fields for the ETag; don't serialize it a second time
+    return encoded_json_response(body, response)
+
+
+@router.get("/search/", response_model=List[product_schemas.Product])
+async def search_products(
+    q: str = Query(..., min_length=1, max_length=100),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    
+    products = await search_crud.search_products(db, q=q, skip=skip, limit=limit)
+    
+    if not products:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No products found matching '{q}'"
+        )
+    if FAST_JSON:
+        return fast_json_response(dump_rows(products, product_schemas.Product))
+    return products
+
+
+@router.get("/filter/", response_model=product_schemas.ProductFilterPage)
+async def filter_products(
+    brand: Optional[List[str]] = Query(None, description="Exact brand; repeat for several"),
+    category_id: Optional[List[int]] = Query(None, description="Category id; repeat for several"),
+    category: Optional[str] = Query(None, description="Category name contains (not indexed, prefer category_id)"),
+    min_price: Optional[Decimal] = Query(None, ge=0),
+    max_price: Optional[Decimal] = Query(None, ge=0),
+    in_stock: Optional[bool] = Query(None),
+    sort: str = Query("id", pattern="^-?(id|price|title)$", description="Sort key, prefix with - for descending"),
+    after: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(20, ge=1, le=100),
+    facets: bool = Query(True, description="Include facet counts; pass false on later pages"),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """Keyset-paginated products matching every given filter, with brand/category/price facet counts"""
+    page = await product_filter_crud.filter_products(
+        db,
+        sort=sort,
+        after=after,
+        limit=limit,
+        facets=facets,
+        brand=brand,
+        category_id=category_id,
+        category=category,
+        min_price=min_price,
+        max_price=max_price,
+        in_stock=in_stock,
+    )
+    if FAST_JSON:
+        return fast_json_response(dict(page, items=dump_rows(page["items"], product_schemas.Product)))
+    return page
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_products(
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    include_category: bool = Query(False, description="Add each product's category name"),
+    gzip: bool = Query(False, description="Compress on the fly (Content-Encoding: gzip)"),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """The whole catalog as NDJSON or CSV, streamed in EXPORT_BATCH_SIZE row batches"""
+    headers = {"Content-Disposition": f'attachment; filename="{export_filename(export_format)}"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        product_export_crud.iter_export(db, export_format, include_category=include_category, compress=gzip),
+        media_type=MEDIA_TYPES[export_format],
+        headers=headers,
+    )
+
+
+@router.post("/import", response_model=product_schemas.ProductImportResult)
+async def import_products(
+    file: UploadFile = File(..., description="CSV or NDJSON, optionally gzipped"),
+    import_format: Optional[str] = Query(None, alias="format", pattern="^(ndjson|csv)$", description="Defaults to the file extension"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Create or update products by title in IMPORT_BATCH_SIZE row batches; bad rows are reported and skipped"""
+    return await product_import_crud.import_products(db, file.file, import_format or import_format_for(file.filename))
+
+
+@router.post("/upload-image/", response_model=product_schemas.Product)
+async def create_product(form_data: product_schemas.ProductCreateForm = Depends(), db: AsyncSession = Depends(get_async_db), image: UploadFile = File()):
+    payload = form_data.to_schema()
+    if not await category_crud.get_category(db, payload.category_id):
+        raise HTTPException(status_code=400, detail="Category does not exist")
+    if await product_crud.get_product_by_title(db, title=payload.title):
+        raise HTTPException(status_code=400, detail="Product title already registered")
+
+    payload.image_url = await save_product_image(image)
+    product = await product_crud.create_product(db, payload)
+    schedule_variants(product.id, product.image_url)
+    return product
+
+@router.post("/", response_model=product_schemas.Product, status_code=status.HTTP_201_CREATED)
+async def create_new_product(product: product_schemas.ProductCreate, db: AsyncSession = Depends(get_async_db)):
+    
+    db_product = await product_crud.get_product_by_title(db, title=product.title)
+    if db_product:
+        raise HTTPException(status_code=400, detail="Product title already registered")
+    return await product_crud.create_product(db=db, product=product)
+
+@router.get("/{product_id}", response_model=product_schemas.Product)
+async def get_product_details(product_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_async_read_db)):
+    
+    product = await product_crud.get_product_cached(db, product_id=product_id)
+    if not product:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+
+    etag = compute_etag(product.model_dump_json())
+    not_modified = conditional_response(request, response, etag, product.updated_at or product.created_at)
+    if not_modified:
+        return not_modified
+    return product
+
+@router.put("/{product_id}", response_model=product_schemas.Product)
+async def update_product_details(
+    product_id: int, 
+    updated_product: product_schemas.ProductUpdate, 
+    db: AsyncSession = Depends(get_async_db)
+):
+  
+    product = await product_crud.update_product(db, product_id=product_id, updated_data=updated_product)
+    if not product:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+    return product
+
+@router.put("/{product_id}/image", response_model=product_schemas.Product)
+async def upload_product_image(product_id: int, image: UploadFile = File(...), db: AsyncSession = Depends(get_async_db)):
+    if not await product_crud.get_product(db, product_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+
+    image_url = await save_product_image(image)
+    product, previous = await product_crud.set_product_image(db, product_id, image_url)
+    if not product:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+    # image_url is writable through PUT /products/{id}; only ever delete uploads of our own
+    if upload_key(previous) and previous != image_url and not await product_crud.image_in_use(db, previous):
+        await run_in_threadpool(delete_product_image, previous)
+    # Thumbnails and WebP/AVIF copies are built in the background and show up on the product when ready
+    schedule_variants(product_id, image_url)
+    return product
+
+@router.delete("/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_product(product_id: int, db: AsyncSession = Depends(get_async_db)):
+   
+    db_product = await product_crud.get_product(db, product_id=product_id)
+    image_url = db_product.image_url if db_product else None
+    success = await product_crud.delete_product(db, product_id=product_id)
+    if not success:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+    if image_url and not await product_crud.image_in_use(db, image_url):
+        await run_in_threadpool(delete_product_image, image_url)
+    return {"message": "Product deleted successfully"}
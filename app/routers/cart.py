@@ -8,6 +8,7 @@ from app.crud import product as product_crud
 from app.dependencies import get_current_user
 from app.utils.jwt_utils import TokenData
 from datetime import datetime, timedelta 
+from typing import List
 from app.models.cart import OrderItem
 
 router = APIRouter()
@@ -28,7 +29,7 @@ def add_item_to_cart(
             detail="You can only add items to your own cart"
         )
     
-    product = product_crud.get_product(db, product_id=input_data.product_id)
+    product = product_crud.get_product_cached(db, product_id=input_data.product_id)
     if not product or not product.in_stock:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found or out of stock")
     
@@ -42,6 +43,22 @@ def add_item_to_cart(
     return orders_item
 
 
+@router.post("/add-items/", response_model=List[cart_schemas.CartItem])
+def add_items_to_cart(
+    input_data: cart_schemas.CartItemsBulkCreate,
+    db: Session = Depends(get_db),
+    current_user: TokenData = Depends(get_current_user)
+):
+    
+    if current_user.user_id != input_data.user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You can only add items to your own cart"
+        )
+    
+    return cart_crud.bulk_add_to_cart(db, user_id=input_data.user_id, lines=input_data.items)
+
+
 @router.put("/update-item/{item_id}")
 def update_cart_item(
     item_id: int,
@@ -50,16 +67,14 @@ def update_cart_item(
     current_user: TokenData = Depends(get_current_user)
 ):
     
-    from app.models.cart import CartItem
-    
-    cart_item = db.query(CartItem).filter(CartItem.id == item_id).first()
+    cart_item = cart_crud.get_order_item_with_order(db, item_id=item_id)
     if not cart_item:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Cart item not found"
         )
     
-    order = cart_crud.get_order(db, order_id=cart_item.order_id)
+    order = cart_item.order
     if order.user_id != current_user.user_id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -72,18 +87,18 @@ def update_cart_item(
             detail="Quantity must be greater than 0"
         )
     
-    product = product_crud.get_product(db, product_id=cart_item.product_id)
-    if quantity > product.stock:
+    product = cart_item.product
+    if not product or not product.in_stock:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Only {product.stock} items available"
+            detail="Product is out of stock"
         )
     
     cart_item.quantity = quantity
     db.commit()
     db.refresh(cart_item)
     
-    return {"message": "Item updated", "item": cart_item}
+    return {"message": "Item updated", "item": cart_schemas.CartItem.model_validate(cart_item, from_attributes=True)}
 
 
 @router.delete("/remove-item/{item_id}")
@@ -93,16 +108,14 @@ def remove_cart_item(
     current_user: TokenData = Depends(get_current_user)
 ):
    
-    
-    
-    orders_item = db.query(OrderItem).filter(OrderItem.id == item_id).first()
+    orders_item = cart_crud.get_order_item_with_order(db, item_id=item_id)
     if not orders_item:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Cart item not found"
         )
     
-    order = cart_crud.get_order(db, order_id=orders_item.order_id)
+    order = orders_item.order
     if order.user_id != current_user.user_id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -122,7 +135,7 @@ def view_cart_details(
     current_user: TokenData = Depends(get_current_user)
 ):
    
-    order = cart_crud.get_order(db, order_id=order_id)
+    order = cart_crud.get_order_with_items(db, order_id=order_id)
     if not order:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, 
@@ -0,0 +1,45 @@
+from fastapi import APIRouter
+from database import get_pool_stats
+from mongo_database import get_mongo_stats
+from app.utils.cache import get_cache_stats
+from app.utils.password_hashing import get_hashing_stats
+from app.utils.email_queue import get_email_queue_stats
+from app.utils.image_variants import get_variant_stats
+from app.utils.storage import get_storage_stats
+
+router = APIRouter()
+
+@router.get("/db-pool")
+def db_pool_stats():
+    
+    return get_pool_stats()
+
+@router.get("/cache")
+def cache_stats():
+    
+    return get_cache_stats()
+
+@router.get("/password-hashing")
+def password_hashing_stats():
+    
+    return get_hashing_stats()
+
+@router.get("/email-queue")
+def email_queue_stats():
+    
+    return get_email_queue_stats()
+
+@router.get("/image-variants")
+def image_variant_stats():
+    
+    return get_variant_stats()
+
+@router.get("/storage")
+def storage_stats():
+    
+    return get_storage_stats()
+
+@router.get("/mongo")
+def mongo_stats():
+    
+    return get_mongo_stats()
@@ -1,31 +1,219 @@
-from fastapi import APIRouter, Body, Request, HTTPException, status
+import json
+import os
+from fastapi import APIRouter, Body, Request, HTTPException, Query, status
 from fastapi.encoders import jsonable_encoder
-from app.schemas.wishlist import WishlistItem
-from typing import List
-from mongo_database import get_mongo_db 
+from fastapi.responses import JSONResponse, StreamingResponse
+from app.schemas.wishlist import WishlistBulkResult, WishlistItem, WishlistPage
+from app.utils.pagination import decode_cursor, encode_cursor
+from typing import List, Optional, Union
+from mongo_database import get_collection
 from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
 
 router = APIRouter()
 
+WISHLIST_COLLECTION = "wishlist"
+# Documents per getMore round trip, and per chunk written by streamed listings
+WISHLIST_BATCH_SIZE = int(os.getenv("WISHLIST_BATCH_SIZE", 500))
+WISHLIST_FIELDS = ("user_id_sqlite", "product_name", "priority")
+WISHLIST_BULK_MAX = int(os.getenv("WISHLIST_BULK_MAX", 10000))
+
 def serialize_doc(doc):
     """Convert MongoDB document to JSON-serializable dict."""
     if doc and "_id" in doc:
         doc["_id"] = str(doc["_id"])
     return doc
 
+def _upsert(item: dict):
+    """Filter and update that add `item`, or update the user's existing item for the same product"""
+    key = {"user_id_sqlite": item["user_id_sqlite"], "product_name": item["product_name"]}
+    # The key fields are copied from the filter when the document is inserted
+    update = {"$set": {"priority": item["priority"]}, "$setOnInsert": {"_id": item["_id"]}}
+    return key, update
+
+
 @router.post("/", response_model=WishlistItem)
 async def create_wishlist_item(request: Request, item: WishlistItem = Body(...)):
     item = jsonable_encoder(item)
-    mongo_collection = request.app.state.mongo_db_client["ecommerce_db"]["wishlist"]
-    new_item = await mongo_collection.insert_one(item)
-    created_item = await mongo_collection.find_one({"_id": new_item.inserted_id})
-    return serialize_doc(created_item)
-
-@router.get("/", response_model=List[WishlistItem])
-async def list_wishlist_items(request: Request):
-    mongo_collection = request.app.state.mongo_db_client["ecommerce_db"]["wishlist"]
-    items = []
-    cursor = mongo_collection.find({})
+    mongo_collection = get_collection(WISHLIST_COLLECTION)
+    key, update = _upsert(item)
+    # One round trip that writes and hands back the stored document
+    saved_item = await mongo_collection.find_one_and_update(
+        key, update, upsert=True, return_document=ReturnDocument.AFTER
+    )
+    return serialize_doc(saved_item)
+
+
+@router.post("/bulk", response_model=WishlistBulkResult)
+async def bulk_upsert_wishlist_items(request: Request, items: List[WishlistItem] = Body(...)):
+    if len(items) > WISHLIST_BULK_MAX:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {WISHLIST_BULK_MAX} items per request"
+        )
+
+    # Later items for the same (user, product) win, as they would one by one;
+    # sending both would make the unordered upserts race each other
+    latest = {}
+    for index, item in enumerate(jsonable_encoder(items)):
+        latest[(item["user_id_sqlite"], item["product_name"])] = (index, item)
+    positions = [index for index, _ in latest.values()]
+    operations = [UpdateOne(*_upsert(item), upsert=True) for _, item in latest.values()]
+    if not operations:
+        return WishlistBulkResult()
+
+    mongo_collection = get_collection(WISHLIST_COLLECTION)
+    errors = []
+    try:
+        # Unordered: the driver sends the operations in as few batches as the
+        # server allows, and one bad item doesn't stop the rest
+        result = await mongo_collection.bulk_write(operations, ordered=False)
+        details = result.bulk_api_result
+    except BulkWriteError as e:
+        details = e.details
+        errors = [
+            {"index": positions[error["index"]], "message": error.get("errmsg", "write failed")}
+            for error in details.get("writeErrors", [])
+        ]
+    return WishlistBulkResult(
+        inserted=details.get("nUpserted", 0),
+        updated=details.get("nModified", 0),
+        unchanged=details.get("nMatched", 0) - details.get("nModified", 0),
+        duplicates=len(items) - len(operations),
+        errors=errors,
+    )
+
+def _invalid_cursor() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Invalid pagination cursor"
+    )
+
+
+def _projection(fields: Optional[str], user_id: Optional[int]) -> Optional[dict]:
+    if not fields:
+        return None
+    requested = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = sorted(set(requested) - set(WISHLIST_FIELDS))
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(WISHLIST_FIELDS)}"
+        )
+    projection = {name: 1 for name in requested}
+    if user_id is not None:
+        # Part of the per-user sort key, so the next cursor can be built
+        projection["priority"] = 1
+    return projection
+
+
+def _listing_query(user_id: Optional[int], after: Optional[str]):
+    """Filter and sort for one user's items by (priority, _id), or everyone's by _id"""
+    query = {}
+    if user_id is not None:
+        query["user_id_sqlite"] = user_id
+        sort = [("priority", 1), ("_id", 1)]
+    else:
+        sort = [("_id", 1)]
+    if not after:
+        return query, sort
+
+    values = decode_cursor(after)
+    last_id = values.get("id")
+    if not isinstance(last_id, str):
+        raise _invalid_cursor()
+    if values.get("oid"):
+        if not ObjectId.is_valid(last_id):
+            raise _invalid_cursor()
+        last_id = ObjectId(last_id)
+    if user_id is None:
+        query.update(_after_id(last_id))
+    else:
+        priority = values.get("priority")
+        if priority is not None and not isinstance(priority, int):
+            raise _invalid_cursor()
+        # Seeks into the (user_id_sqlite, priority, _id) index past the last item
+        if priority is None:
+            # A missing priority sorts as null, before every number
+            query["$or"] = [
+                {"priority": {"$ne": None}},
+                {"priority": None, **_after_id(last_id)},
+            ]
+        else:
+            query["$or"] = [
+                {"priority": {"$gt": priority}},
+                {"priority": priority, **_after_id(last_id)},
+            ]
+    return query, sort
+
+
+def _after_id(last_id) -> dict:
+    """Filter for the _ids that sort after `last_id`"""
+    # $gt only matches values of the same BSON type, and every string sorts before
+    # every ObjectId, so after a string id all the ObjectId documents are still to come
+    if isinstance(last_id, ObjectId):
+        return {"_id": {"$gt": last_id}}
+    return {"$or": [{"_id": {"$gt": last_id}}, {"_id": {"$type": "objectId"}}]}
+
+
+def _next_cursor(doc: dict, user_id: Optional[int]) -> str:
+    # Items created through this router store _id as a hex string, older ones may
+    # have ObjectIds, so the cursor remembers which type the last one was
+    values = {"id": str(doc["_id"]), "oid": isinstance(doc["_id"], ObjectId)}
+    if user_id is not None:
+        values["priority"] = doc.get("priority")
+    return encode_cursor(values)
+
+
+async def _stream_json_array(cursor):
+    # Writes WISHLIST_BATCH_SIZE documents at a time instead of one message per document
+    yield "["
+    separator = ""
+    chunk = []
     async for doc in cursor:
-        items.append(serialize_doc(doc))
+        chunk.append(json.dumps(serialize_doc(doc), default=str))
+        if len(chunk) >= WISHLIST_BATCH_SIZE:
+            yield separator + ",".join(chunk)
+            separator = ","
+            chunk = []
+    if chunk:
+        yield separator + ",".join(chunk)
+    yield "]"
+
+
+@router.get("/", response_model=Union[List[WishlistItem], WishlistPage])
+async def list_wishlist_items(
+    request: Request,
+    user_id: Optional[int] = Query(None, description="Only this SQLite user's items, ordered by priority"),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: bool = Query(False, description="Use keyset pagination and return a page with next_cursor"),
+    after: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return; _id is always included"),
+    stream: bool = Query(False, description="Stream every matching item as a JSON array instead of one page"),
+):
+    mongo_collection = get_collection(WISHLIST_COLLECTION)
+    projection = _projection(fields, user_id)
+    query, sort = _listing_query(user_id, after)
+
+    if stream:
+        # Only one batch is held in memory at a time, however long the wishlist is
+        documents = mongo_collection.find(query, projection).sort(sort).batch_size(WISHLIST_BATCH_SIZE)
+        return StreamingResponse(_stream_json_array(documents), media_type="application/json")
+
+    # Fetch one extra document to learn whether another page exists, all in the first batch
+    documents = mongo_collection.find(query, projection).sort(sort).limit(limit + 1).batch_size(limit + 1)
+    docs = [doc async for doc in documents]
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = _next_cursor(docs[-1], user_id)
+    items = [serialize_doc(doc) for doc in docs]
+
+    paged = cursor or after is not None
+    if projection is not None:
+        # Partial documents don't satisfy WishlistItem, so skip response_model validation
+        return JSONResponse({"items": items, "next_cursor": next_cursor} if paged else items)
+    if paged:
+        return {"items": items, "next_cursor": next_cursor}
     return items
@@ -1,106 +1,156 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Query
+from decimal import Decimal
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, UploadFile, File, Query
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional, Union
 from sqlalchemy import or_
 from app import models, schemas
 from app.models.product import Product
-from database import get_db
+from database import get_db, get_read_db
 from app.schemas import product as product_schemas
 from app.crud import product as product_crud
-from app.utils.file_handler import save_product_image
-from app.routers.utils import upload_to_s3
+from app.crud import category as category_crud
+from app.crud import search as search_crud
+from app.crud import product_filter as product_filter_crud
+from app.crud import product_export as product_export_crud
+from app.crud.product_export import MEDIA_TYPES, export_filename
+from app.crud import product_import as product_import_crud
+from app.crud.product_import import import_format_for
+from app.utils.conditional import compute_etag, conditional_response
+from app.utils.fast_json import dump_rows, dumps, encoded_json_response, fast_json_enabled, fast_json_response
+from app.utils.file_handler import save_product_image, delete_product_image, upload_key
+from app.utils.image_variants import schedule_variants
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 
 
 router = APIRouter()
-
-@router.get("/", response_model=List[product_schemas.Product])
-def list_products(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-   
-    products = product_crud.get_products(db, skip=skip, limit=limit)
-    return products
+# Lists skip response_model validation and go out through orjson (FAST_JSON_ROUTERS)
+FAST_JSON = fast_json_enabled("products")
+
+@router.get("/", response_model=Union[List[product_schemas.Product], product_schemas.ProductPage])
+def list_products(
+    request: Request,
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: bool = Query(False, description="Use keyset pagination and return a page with next_cursor"),
+    after: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    db: Session = Depends(get_read_db)
+):
+    if cursor or after:
+        items, next_cursor = product_crud.get_products_page(db, after=after, limit=limit)
+        content = {"items": dump_rows(items, product_schemas.Product), "next_cursor": next_cursor}
+    else:
+        items = product_crud.get_products(db, skip=skip, limit=limit)
+        content = dump_rows(items, product_schemas.Product)
+
+    # The ETag covers the page actually served, so any write that changes it is seen
+    body = dumps(content)
+    not_modified = conditional_response(request, response, compute_etag(body))
+    if not_modified:
+        return not_modified
+    # Already encoded from the schema's fields for the ETag; don't serialize it a second time
+    return encoded_json_response(body, response)
 
 
 @router.get("/search/", response_model=List[product_schemas.Product])
 def search_products(
     q: str = Query(..., min_length=1, max_length=100),
-    db: Session = Depends(get_db)
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_read_db)
 ):
     
-    
-    products = db.query(Product).filter(
-        or_(
-            Product.title.ilike(f"%{q}%"),
-            Product.description.ilike(f"%{q}%")
-        )
-    ).all()
+    products = search_crud.search_products(db, q=q, skip=skip, limit=limit)
     
     if not products:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"No products found matching '{q}'"
         )
+    if FAST_JSON:
+        return fast_json_response(dump_rows(products, product_schemas.Product))
     return products
 
 
-@router.get("/filter/", response_model=List[product_schemas.Product])
+@router.get("/filter/", response_model=product_schemas.ProductFilterPage)
 def filter_products(
-    category: str = Query(None),
-    min_price: float = Query(None),
-    max_price: float = Query(None),
-    brand: str = Query(None),
+    brand: Optional[List[str]] = Query(None, description="Exact brand; repeat for several"),
+    category_id: Optional[List[int]] = Query(None, description="Category id; repeat for several"),
+    category: Optional[str] = Query(None, description="Category name contains (not indexed, prefer category_id)"),
+    min_price: Optional[Decimal] = Query(None, ge=0),
+    max_price: Optional[Decimal] = Query(None, ge=0),
+    in_stock: Optional[bool] = Query(None),
+    sort: str = Query("id", pattern="^-?(id|price|title)$", description="Sort key, prefix with - for descending"),
+    after: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(20, ge=1, le=100),
+    facets: bool = Query(True, description="Include facet counts; pass false on later pages"),
+    db: Session = Depends(get_read_db)
+):
+    """Keyset-paginated products matching every given filter, with brand/category/price facet counts"""
+    page = product_filter_crud.filter_products(
+        db,
+        sort=sort,
+        after=after,
+        limit=limit,
+        facets=facets,
+        brand=brand,
+        category_id=category_id,
+        category=category,
+        min_price=min_price,
+        max_price=max_price,
+        in_stock=in_stock,
+    )
+    if FAST_JSON:
+        return fast_json_response(dict(page, items=dump_rows(page["items"], product_schemas.Product)))
+    return page
+
+
+@router.get("/export", response_class=StreamingResponse)
+def export_products(
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    include_category: bool = Query(False, description="Add each product's category name"),
+    gzip: bool = Query(False, description="Compress on the fly (Content-Encoding: gzip)"),
+    db: Session = Depends(get_read_db)
+):
+    """The whole catalog as NDJSON or CSV, streamed in EXPORT_BATCH_SIZE row batches"""
+    headers = {"Content-Disposition": f'attachment; filename="{export_filename(export_format)}"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        product_export_crud.iter_export(db, export_format, include_category=include_category, compress=gzip),
+        media_type=MEDIA_TYPES[export_format],
+        headers=headers,
+    )
+
+
+@router.post("/import", response_model=product_schemas.ProductImportResult)
+async def import_products(
+    file: UploadFile = File(..., description="CSV or NDJSON, optionally gzipped"),
+    import_format: Optional[str] = Query(None, alias="format", pattern="^(ndjson|csv)$", description="Defaults to the file extension"),
     db: Session = Depends(get_db)
 ):
-    
-    from sqlalchemy import and_
-    from app.models.product import Product
-    
-    query = db.query(Product)
-    
-    if category:
-        query = query.filter(Product.category.ilike(f"%{category}%"))
-    
-    if min_price is not None:
-        query = query.filter(Product.price >= min_price)
-    
-    if max_price is not None:
-        query = query.filter(Product.price <= max_price)
-    
-    if brand:
-        query = query.filter(Product.brand.ilike(f"%{brand}%"))
-    
-    products = query.all()
-    
-    if not products:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="No products found with the given filters"
-        )
-    return products
+    """Create or update products by title in IMPORT_BATCH_SIZE row batches; bad rows are reported and skipped"""
+    # async so the upload is spooled without holding a threadpool slot; the import itself runs in the pool
+    return await run_in_threadpool(
+        product_import_crud.import_products, db, file.file, import_format or import_format_for(file.filename)
+    )
 
 
 @router.post("/upload-image/", response_model=product_schemas.Product)
-def create_product(form_data: product_schemas.ProductCreateForm = Depends(), db: Session = Depends(get_db),image: UploadFile = File()):
+async def create_product(form_data: product_schemas.ProductCreateForm = Depends(), db: Session = Depends(get_db),image: UploadFile = File()):
     payload = form_data.to_schema()
-    category = db.query(models.Category).get(payload.category_id)
+    category = await run_in_threadpool(category_crud.get_category, db, payload.category_id)
     if not category:
         raise HTTPException(status_code=400, detail="Category does not exist")
-    
-    print("---------------------------",image.filename)
-    file_url=upload_to_s3(image)
-    print("File uploaded to S3 at URL:", file_url) 
-
+    if await run_in_threadpool(product_crud.get_product_by_title, db, payload.title):
+        raise HTTPException(status_code=400, detail="Product title already registered")
 
-    
-    product = models.Product(
-        title=payload.name,
-        description=payload.description,
-        price=payload.price,
-        category_id=payload.category_id,
-        total_units=payload.total_units,
-        product_image=file_url,
-        remaining_units=payload.remaining_units if payload.remaining_units is not None else payload.total_units,
-        quantity=payload.quantity
-    )
+    # Streams to the configured storage backend (local disk or S3) on its upload pool
+    payload.image_url = await save_product_image(image)
+    product = await run_in_threadpool(product_crud.create_product, db, payload)
+    schedule_variants(product.id, product.image_url)
+    return product
 
 @router.post("/", response_model=product_schemas.Product, status_code=status.HTTP_201_CREATED)
 def create_new_product(product: product_schemas.ProductCreate, db: Session = Depends(get_db)):
@@ -111,11 +161,16 @@ def create_new_product(product: product_schemas.ProductCreate, db: Session = Dep
     return product_crud.create_product(db=db, product=product)
 
 @router.get("/{product_id}", response_model=product_schemas.Product)
-def get_product_details(product_id: int, db: Session = Depends(get_db)):
+def get_product_details(product_id: int, request: Request, response: Response, db: Session = Depends(get_read_db)):
     
-    product = product_crud.get_product(db, product_id=product_id)
+    product = product_crud.get_product_cached(db, product_id=product_id)
     if not product:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+
+    etag = compute_etag(product.model_dump_json())
+    not_modified = conditional_response(request, response, etag, product.updated_at or product.created_at)
+    if not_modified:
+        return not_modified
     return product
 
 @router.put("/{product_id}", response_model=product_schemas.Product)
@@ -130,12 +185,33 @@ def update_product_details(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
     return product
 
+@router.put("/{product_id}/image", response_model=product_schemas.Product)
+async def upload_product_image(product_id: int, image: UploadFile = File(...), db: Session = Depends(get_db)):
+    # async so the upload streams to disk without holding a threadpool slot for its whole duration
+    if not await run_in_threadpool(product_crud.get_product, db, product_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+
+    image_url = await save_product_image(image)
+    product, previous = await run_in_threadpool(product_crud.set_product_image, db, product_id, image_url)
+    if not product:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+    # image_url is writable through PUT /products/{id}; only ever delete uploads of our own
+    if upload_key(previous) and previous != image_url and not await run_in_threadpool(product_crud.image_in_use, db, previous):
+        await run_in_threadpool(delete_product_image, previous)
+    # Thumbnails and WebP/AVIF copies are built in the background and show up on the product when ready
+    schedule_variants(product_id, image_url)
+    return product
+
 @router.delete("/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_product(product_id: int, db: Session = Depends(get_db)):
    
+    db_product = product_crud.get_product(db, product_id=product_id)
+    image_url = db_product.image_url if db_product else None
     success = product_crud.delete_product(db, product_id=product_id)
     if not success:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+    if image_url and not product_crud.image_in_use(db, image_url):
+        delete_product_image(image_url)
     return {"message": "Product deleted successfully"}
 
 
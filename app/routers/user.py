@@ -4,30 +4,28 @@ from database import get_db
 from app.schemas import user as user_schemas
 from app.crud import user as user_crud
 from app.utils.jwt_utils import create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
-from app.utils.email_utils import send_verification_email, send_password_reset_email
 from datetime import timedelta
-import asyncio
-from fastapi import BackgroundTasks
 from app.dependencies import get_current_user
+from app.utils import password_hashing
+from fastapi.concurrency import run_in_threadpool
 
 router = APIRouter()
 
+# register and login are async so bcrypt runs on the password hashing pool without
+# holding a threadpool slot; only the short DB calls hop to the threadpool
+
 @router.post("/register/", status_code=status.HTTP_201_CREATED)
-def register_user(
+async def register_user(
     user: user_schemas.UserCreate,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
 ):
-    db_user = user_crud.get_user_by_email(db, email=user.email)
+    db_user = await run_in_threadpool(user_crud.get_user_by_email, db, email=user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    db_user, verification_token = user_crud.create_user(db=db, user=user)
-
-    background_tasks.add_task(
-        send_verification_email,
-        user.email,
-        verification_token
+    hashed_password = await password_hashing.hash_password(user.password)
+    db_user, _ = await run_in_threadpool(
+        user_crud.create_user, db=db, user=user, hashed_password=hashed_password
     )
 
     return {
@@ -52,9 +50,9 @@ def verify_email(request: user_schemas.EmailVerificationRequest, db: Session = D
     return user
 
 @router.post("/login/")
-def login_user(user_credentials: user_schemas.UserLogin, db: Session = Depends(get_db)):
+async def login_user(user_credentials: user_schemas.UserLogin, db: Session = Depends(get_db)):
     
-    db_user = user_crud.get_user_by_email(db, email=user_credentials.email)
+    db_user = await run_in_threadpool(user_crud.get_user_by_email, db, email=user_credentials.email)
     if not db_user:
         raise HTTPException(status_code=401, detail="Incorrect email or password")
     
@@ -65,8 +63,15 @@ def login_user(user_credentials: user_schemas.UserLogin, db: Session = Depends(g
     )
 
     
-    if not user_crud.verify_password(user_credentials.password, db_user.hashed_password):
+    if not await password_hashing.verify_password(user_credentials.password, db_user.hashed_password):
         raise HTTPException(status_code=401, detail="Incorrect email or password")
+
+    # Transparently upgrade hashes made with another cost factor
+    if password_hashing.needs_rehash(db_user.hashed_password):
+        new_hash = await password_hashing.hash_password(user_credentials.password)
+        db_user = await run_in_threadpool(
+            user_crud.update_user, db, user_id=db_user.id, user_update={"hashed_password": new_hash}
+        )
     
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
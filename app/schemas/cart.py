@@ -1,13 +1,17 @@
 
 from decimal import ROUND_HALF_UP, Decimal
 from typing import List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 
 class CartItemCreate(BaseModel):
     product_id: int
     quantity: int
 
+class CartItemsBulkCreate(BaseModel):
+    user_id: int
+    items: List[CartItemCreate] = Field(..., min_length=1, max_length=500)
+
 class CartItem(BaseModel):
     id: int
     product_id: int
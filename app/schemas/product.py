@@ -1,7 +1,7 @@
 from decimal import Decimal
-from pydantic import BaseModel, Field
+from pydantic import AliasChoices, BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import Dict, List, Optional
 from fastapi import Form
 
 class ProductBase(BaseModel):
@@ -33,11 +33,19 @@ class ProductUpdate(ProductBase):
 class Product(ProductBase):
     id: int
     category_id: int
+    thumbnail_url: Optional[str] = None
+    # e.g. {"thumb.webp": "/uploads/products/<hash>.thumb.webp", "medium.avif": ...}
+    image_variants: Optional[Dict[str, str]] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
+
+class ProductPage(BaseModel):
+    items: List[Product]
+    next_cursor: Optional[str] = None
+
 class ProductCreateForm:
     def __init__(
         self,
@@ -68,3 +76,55 @@ class ProductCreateForm:
         quantity=self.quantity,
         remaining_units=self.remaining_units,
     )
+
+class BrandFacet(BaseModel):
+    brand: Optional[str] = None
+    count: int
+
+class CategoryFacet(BaseModel):
+    category_id: Optional[int] = None
+    count: int
+
+class PriceRangeFacet(BaseModel):
+    # None on the open-ended lowest/highest range
+    min_price: Optional[Decimal] = None
+    max_price: Optional[Decimal] = None
+    count: int
+
+class ProductFacets(BaseModel):
+    brands: List[BrandFacet]
+    categories: List[CategoryFacet]
+    price_ranges: List[PriceRangeFacet]
+
+class ProductFilterPage(BaseModel):
+    items: List[Product]
+    next_cursor: Optional[str] = None
+    facets: Optional[ProductFacets] = None
+
+class ProductImportRow(BaseModel):
+    """One CSV/NDJSON row of a catalog import; other columns (e.g. id from /products/export) are ignored"""
+    title: str = Field(..., min_length=1, max_length=255)
+    description: Optional[str] = None
+    price: Decimal = Field(..., gt=0, max_digits=10, decimal_places=2)
+    brand: Optional[str] = Field(None, max_length=255)
+    image_url: Optional[str] = None
+    # Left out, an existing product keeps its stock flag and a new one is in stock
+    in_stock: Optional[bool] = None
+    category_id: Optional[int] = None
+    # Category name, resolved to its id; the export's category_name column is read as well
+    category: Optional[str] = Field(None, validation_alias=AliasChoices("category", "category_name"))
+
+class ProductImportError(BaseModel):
+    line: int
+    title: Optional[str] = None
+    message: str
+
+class ProductImportResult(BaseModel):
+    rows: int = 0
+    inserted: int = 0
+    updated: int = 0
+    # Rows dropped because a later row in the same batch had the same title
+    duplicates: int = 0
+    failed: int = 0
+    # The first IMPORT_MAX_ERRORS failures
+    errors: List[ProductImportError] = []
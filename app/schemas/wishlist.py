@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 from bson import ObjectId
 import pydantic
 
@@ -46,3 +46,22 @@ class WishlistItem(BaseModel):
         json_encoders = {ObjectId: str}
         allow_population_by_field_name = True
         arbitrary_types_allowed = True
+
+
+class WishlistPage(BaseModel):
+    items: List[WishlistItem]
+    next_cursor: Optional[str] = None
+
+
+class WishlistBulkError(BaseModel):
+    index: int
+    message: str
+
+
+class WishlistBulkResult(BaseModel):
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    # Items dropped because a later item in the request had the same user and product
+    duplicates: int = 0
+    errors: List[WishlistBulkError] = []
@@ -0,0 +1,448 @@
+"""
+Caching for hot catalog reads
+
+Two backends share one interface (get / set / delete / clear / get_or_load):
+
+* "memory" - a per-process LRU with TTL
+* "redis"  - entries live in Redis so every uvicorn worker sees the same data,
+  fronted by a short-lived local LRU. Deletes are broadcast over pub/sub so each
+  worker drops its local copy immediately.
+
+Misses go through get_or_load, which coalesces concurrent loads of the same key
+into a single call so a cold key does not stampede the database.
+"""
+import asyncio
+import json
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory").lower()
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+CACHE_INVALIDATION_CHANNEL = os.getenv("CACHE_INVALIDATION_CHANNEL", "cache-invalidation")
+# Upper bound on how long a worker may serve a local copy if an invalidation message is lost
+CACHE_LOCAL_TTL = float(os.getenv("CACHE_LOCAL_TTL", 30))
+# Longest wait between attempts to resubscribe the invalidation listener
+CACHE_LISTENER_MAX_BACKOFF = float(os.getenv("CACHE_LISTENER_MAX_BACKOFF", 30))
+
+PRODUCT_CACHE_SIZE = int(os.getenv("PRODUCT_CACHE_SIZE", 10000))
+PRODUCT_CACHE_TTL = float(os.getenv("PRODUCT_CACHE_TTL", 60))
+CATEGORY_CACHE_TTL = float(os.getenv("CATEGORY_CACHE_TTL", 300))
+
+# Every cache registers itself here so /diagnostics/cache can report on it
+CACHES = {}
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs at most one load per key at a time; concurrent callers wait for and share its result"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._async_calls = {}
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result
+
+    async def ado(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._async_calls.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._async_calls[key] = future
+        try:
+            result = await fn()
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception retrieved when nobody else was waiting
+            future.exception()
+            raise
+        finally:
+            if not future.done():
+                future.cancel()
+            del self._async_calls[key]
+
+
+class BaseCache:
+    def __init__(self, name: str, register: bool = True):
+        self.name = name
+        self._flight = SingleFlight()
+        if register:
+            CACHES[name] = self
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        raise NotImplementedError
+
+    def delete(self, key: Hashable):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        raise NotImplementedError
+
+    async def aget(self, key: Hashable) -> Optional[Any]:
+        """get for the event loop; backends that do network I/O override it"""
+        return self.get(key)
+
+    async def aset(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        self.set(key, value, ttl)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Optional[Any]:
+        """Return the cached value or call `loader` once (across threads) and cache a non-None result"""
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        def load():
+            loaded = loader()
+            if loaded is not None:
+                self.set(key, loaded)
+            return loaded
+
+        return self._flight.do(key, load)
+
+    async def aget_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Optional[Any]:
+        """Async twin of get_or_load for the async routers"""
+        value = await self.aget(key)
+        if value is not None:
+            return value
+
+        async def load():
+            loaded = await loader()
+            if loaded is not None:
+                await self.aset(key, loaded)
+            return loaded
+
+        return await self._flight.ado(key, load)
+
+
+class TTLCache(BaseCache):
+    """Thread-safe LRU cache whose entries also expire `ttl` seconds after being set"""
+
+    def __init__(self, name: str, maxsize: int, ttl: float, register: bool = True):
+        super().__init__(name, register)
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store `value`; `ttl` overrides the cache-wide lifetime for this entry"""
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            if self._data.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._data)
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": "memory",
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "coalesced_loads": self._flight.coalesced,
+            }
+
+
+_redis_client = None
+
+
+def get_redis_client():
+    """Shared Redis client, created on first use so the memory backend never needs the redis package"""
+    global _redis_client
+    if _redis_client is None:
+        import redis
+        _redis_client = redis.Redis.from_url(REDIS_URL)
+    return _redis_client
+
+
+def _off_event_loop(fn: Callable, *args):
+    """
+    Run a Redis write in the default executor when called on an event loop and
+    inline otherwise. Only for writes nobody waits on: in async mode the sync
+    crud functions run on the loop through AsyncSession.run_sync.
+    """
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        fn(*args)
+        return
+    loop.run_in_executor(None, fn, *args)
+
+
+class RedisCache(BaseCache):
+    """Cache shared by all workers through Redis, with a local LRU in front of it"""
+
+    def __init__(self, name: str, maxsize: int, ttl: float, client=None, local_ttl: float = CACHE_LOCAL_TTL):
+        super().__init__(name)
+        self.ttl = ttl
+        self._client = client
+        self.local = TTLCache(f"{name}.local", maxsize, min(ttl, local_ttl), register=False)
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = get_redis_client()
+        return self._client
+
+    def _key(self, key: Hashable) -> str:
+        return f"cache:{self.name}:{key}"
+
+    def _publish(self, key):
+        self.client.publish(CACHE_INVALIDATION_CHANNEL, json.dumps({"cache": self.name, "key": key}))
+
+    def _fetch(self, key: Hashable) -> Optional[bytes]:
+        try:
+            return self.client.get(self._key(key))
+        except Exception as e:
+            # Redis being down degrades to a miss, never to a failed request
+            self.errors += 1
+            print(f"Cache backend error on get: {e}")
+            return None
+
+    def _fetched(self, key: Hashable, raw: Optional[bytes]) -> Optional[Any]:
+        if raw is None:
+            self.misses += 1
+            return None
+        value = pickle.loads(raw)
+        self.local.set(key, value)
+        self.hits += 1
+        return value
+
+    def _local_hit(self, key: Hashable) -> Optional[Any]:
+        value = self.local.get(key)
+        if value is not None:
+            self.hits += 1
+        return value
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        value = self._local_hit(key)
+        if value is not None:
+            return value
+        return self._fetched(key, self._fetch(key))
+
+    async def aget(self, key: Hashable) -> Optional[Any]:
+        value = self._local_hit(key)
+        if value is not None:
+            return value
+        return self._fetched(key, await asyncio.to_thread(self._fetch, key))
+
+    def _store(self, key: Hashable, value: Any, ttl: float):
+        try:
+            self.client.set(self._key(key), pickle.dumps(value), px=max(1, int(ttl * 1000)))
+        except Exception as e:
+            self.errors += 1
+            print(f"Cache backend error on set: {e}")
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        self.local.set(key, value, ttl=min(ttl, self.local.ttl))
+        _off_event_loop(self._store, key, value, ttl)
+
+    async def aset(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        self.local.set(key, value, ttl=min(ttl, self.local.ttl))
+        await asyncio.to_thread(self._store, key, value, ttl)
+
+    def _remove(self, key: Hashable):
+        try:
+            self.client.delete(self._key(key))
+            self._publish(key)
+        except Exception as e:
+            # The write is already committed; other workers fall back to CACHE_LOCAL_TTL
+            self.errors += 1
+            print(f"Cache backend error on delete: {e}")
+
+    def delete(self, key: Hashable):
+        self.local.delete(key)
+        # Inline even on the event loop: the write that called this must not
+        # answer before the other workers have been told to drop their copies
+        self._remove(key)
+
+    def _remove_all(self):
+        try:
+            keys = list(self.client.scan_iter(match=self._key("*")))
+            if keys:
+                self.client.delete(*keys)
+            self._publish(None)
+        except Exception as e:
+            self.errors += 1
+            print(f"Cache backend error on clear: {e}")
+
+    def clear(self):
+        self.local.clear()
+        # Inline for the same reason as delete
+        self._remove_all()
+
+    def invalidate_local(self, key):
+        if key is None:
+            self.local.clear()
+        else:
+            self.local.delete(key)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": "redis",
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "errors": self.errors,
+            "coalesced_loads": self._flight.coalesced,
+            "local": self.local.stats(),
+        }
+
+
+def make_cache(name: str, maxsize: int, ttl: float) -> BaseCache:
+    if CACHE_BACKEND == "redis":
+        return RedisCache(name, maxsize=maxsize, ttl=ttl)
+    return TTLCache(name, maxsize=maxsize, ttl=ttl)
+
+
+_listener = None
+
+
+def _apply_invalidation(message):
+    try:
+        payload = json.loads(message["data"])
+        cache = CACHES.get(payload["cache"])
+        if isinstance(cache, RedisCache):
+            cache.invalidate_local(payload["key"])
+    except Exception as e:
+        print(f"Ignoring malformed cache invalidation: {e}")
+
+
+def start_invalidation_listener(client=None):
+    """
+    Drop local copies when any worker publishes an invalidation. No-op for the memory backend.
+
+    The subscription lives in a background thread that resubscribes with
+    backoff, so Redis being down neither blocks start-up nor ends the listener.
+    """
+    global _listener
+    if _listener is not None or not any(isinstance(c, RedisCache) for c in CACHES.values()):
+        return
+
+    def listen():
+        backoff = 1.0
+        while True:
+            pubsub = None
+            try:
+                pubsub = (client or get_redis_client()).pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CACHE_INVALIDATION_CHANNEL)
+                # Invalidations published while unsubscribed were missed
+                for cache in CACHES.values():
+                    if isinstance(cache, RedisCache):
+                        cache.invalidate_local(None)
+                backoff = 1.0
+                for message in pubsub.listen():
+                    _apply_invalidation(message)
+            except Exception as e:
+                print(f"Cache invalidation listener lost Redis, resubscribing in {backoff:.0f}s: {e}")
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+            time.sleep(backoff)
+            backoff = min(backoff * 2, CACHE_LISTENER_MAX_BACKOFF)
+
+    _listener = threading.Thread(target=listen, name="cache-invalidation", daemon=True)
+    _listener.start()
+
+
+product_cache = make_cache("products", maxsize=PRODUCT_CACHE_SIZE, ttl=PRODUCT_CACHE_TTL)
+category_cache = make_cache("categories", maxsize=1, ttl=CATEGORY_CACHE_TTL)
+
+
+def get_cache_stats() -> dict:
+    return {name: cache.stats() for name, cache in CACHES.items()}
@@ -0,0 +1,71 @@
+"""
+HTTP conditional GET helpers (ETag / Last-Modified / 304 Not Modified)
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+from fastapi import Request, Response, status
+
+
+def compute_etag(*parts) -> str:
+    """Weak ETag over the given version parts (counts, ids, timestamps, query params, serialized bodies)"""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()
+    return f'W/"{digest}"'
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive CURRENT_TIMESTAMP values, which are UTC
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+    bare = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == bare:
+            return True
+    return False
+
+
+def conditional_response(
+    request: Request,
+    response: Response,
+    etag: str,
+    last_modified: Optional[datetime] = None,
+) -> Optional[Response]:
+    """
+    Put ETag/Last-Modified on `response` and return a 304 response when the client's copy is current.
+
+    Call it before loading or serializing the body; the endpoint returns the 304
+    as-is and only builds the full response when this returns None.
+    """
+    headers = {"ETag": etag}
+    if last_modified is not None:
+        last_modified = _as_utc(last_modified).replace(microsecond=0)
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+    response.headers.update(headers)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        fresh = _etag_matches(if_none_match, etag)
+    else:
+        # If-Modified-Since is only consulted when there is no If-None-Match
+        fresh = False
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since and last_modified is not None:
+            try:
+                fresh = last_modified <= _as_utc(parsedate_to_datetime(if_modified_since))
+            except (TypeError, ValueError):
+                fresh = False
+
+    if fresh:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return None
@@ -0,0 +1,335 @@
+"""
+Durable outbound email queue
+
+Endpoints commit a row to email_jobs instead of sending inline or through
+BackgroundTasks, so a restart never loses a message.
+Worker coroutines started with the app claim due jobs in batches, push a whole
+batch through one SMTP connection (kept open between batches until it has been
+idle for EMAIL_SMTP_IDLE_TIMEOUT) and write the outcome back:
+
+* sent            - done
+* 4xx / network   - retried with exponential backoff up to EMAIL_MAX_ATTEMPTS
+* 5xx             - permanent, marked failed straight away
+
+Delivery is at-least-once: a worker that dies after sending but before recording
+the result leaves its jobs in "sending", and they are retried after
+EMAIL_LOCK_TIMEOUT. Each message carries a Message-ID derived from the job id so
+receivers can drop such duplicates.
+
+Set EMAIL_WORKERS=0 on web processes to leave sending to other instances.
+"""
+import asyncio
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from email.utils import make_msgid
+from typing import List, Optional
+
+import aiosmtplib
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from app.crud import email_job as email_job_crud
+from app.utils import email_utils
+
+
+EMAIL_WORKERS = int(os.getenv("EMAIL_WORKERS", 1))
+EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", 50))
+EMAIL_POLL_INTERVAL = float(os.getenv("EMAIL_POLL_INTERVAL", 2))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", 6))
+EMAIL_RETRY_BASE_DELAY = float(os.getenv("EMAIL_RETRY_BASE_DELAY", 30))
+EMAIL_RETRY_MAX_DELAY = float(os.getenv("EMAIL_RETRY_MAX_DELAY", 3600))
+EMAIL_SMTP_TIMEOUT = float(os.getenv("EMAIL_SMTP_TIMEOUT", 30))
+EMAIL_SMTP_IDLE_TIMEOUT = float(os.getenv("EMAIL_SMTP_IDLE_TIMEOUT", 30))
+# A job left in "sending" this long belonged to a worker that died; send it again.
+# Live workers renew their claim every third of it while working through a batch.
+EMAIL_LOCK_TIMEOUT = float(os.getenv("EMAIL_LOCK_TIMEOUT", 300))
+
+
+_stats_lock = threading.Lock()
+_stats = {
+    "enqueued": 0,
+    "sent": 0,
+    "retried": 0,
+    "failed": 0,
+    "batches": 0,
+    "smtp_connections": 0,
+    "send_seconds": 0.0,
+    "total_latency_seconds": 0.0,
+    "max_latency_seconds": 0.0,
+}
+
+_workers: List[asyncio.Task] = []
+_wakeup: Optional[asyncio.Event] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _count(**increments):
+    with _stats_lock:
+        for key, value in increments.items():
+            _stats[key] += value
+
+
+def _wake():
+    # Called from request handlers, which may be on a threadpool thread
+    if _loop is not None and _wakeup is not None and not _loop.is_closed():
+        _loop.call_soon_threadsafe(_wakeup.set)
+
+
+def wake_workers():
+    """Let the workers pick up jobs committed by a caller that queued them with commit=False"""
+    _wake()
+
+
+def queue_email(db: Session, recipient: str, subject: str, body: str, kind: str = "generic", commit: bool = True):
+    """Persist an outbound email; a worker sends it shortly after the commit.
+
+    With commit=False the job is only added to the caller's transaction, so it is
+    written together with the caller's own rows; call wake_workers() after committing.
+    """
+    db_job = email_job_crud.enqueue_email(
+        db, recipient=recipient, subject=subject, body=body, kind=kind, commit=commit
+    )
+    _count(enqueued=1)
+    if commit:
+        _wake()
+    return db_job
+
+
+def queue_verification_email(db: Session, email: str, verification_token: str, commit: bool = True):
+    subject, body = email_utils.verification_email(verification_token)
+    return queue_email(db, email, subject, body, kind="verification", commit=commit)
+
+
+def queue_password_reset_email(db: Session, email: str, reset_token: str):
+    subject, body = email_utils.password_reset_email(reset_token)
+    return queue_email(db, email, subject, body, kind="password_reset")
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter for a job that has failed `attempts` times"""
+    delay = min(EMAIL_RETRY_MAX_DELAY, EMAIL_RETRY_BASE_DELAY * 2 ** (attempts - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _is_permanent(error: Exception) -> bool:
+    if isinstance(error, aiosmtplib.SMTPRecipientsRefused):
+        return all(500 <= refused.code < 600 for refused in error.recipients)
+    code = getattr(error, "code", None)
+    return isinstance(code, int) and 500 <= code < 600
+
+
+def _build_message(job: dict) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = email_utils.MAIL_FROM
+    message["To"] = job["recipient"]
+    message["Subject"] = job["subject"]
+    domain = email_utils.MAIL_FROM.rpartition("@")[2] or socket.getfqdn()
+    message["Message-ID"] = make_msgid(idstring=f"email-job-{job['id']}", domain=domain)
+    message.set_content(job["body"], subtype="html")
+    return message
+
+
+class SMTPSender:
+    """One worker's SMTP session, opened on demand and reused across messages and batches"""
+
+    def __init__(self):
+        self._smtp: Optional[aiosmtplib.SMTP] = None
+        self._last_used = 0.0
+
+    async def connect(self) -> aiosmtplib.SMTP:
+        if self._smtp is not None and self._smtp.is_connected:
+            return self._smtp
+        email_utils.check_mail_settings()
+        smtp = aiosmtplib.SMTP(
+            hostname=email_utils.MAIL_SERVER,
+            port=email_utils.MAIL_PORT,
+            use_tls=email_utils.MAIL_SSL_TLS,
+            start_tls=email_utils.MAIL_STARTTLS,
+            validate_certs=email_utils.MAIL_VALIDATE_CERTS,
+            timeout=EMAIL_SMTP_TIMEOUT,
+        )
+        await smtp.connect()
+        if email_utils.MAIL_USE_CREDENTIALS:
+            await smtp.login(email_utils.MAIL_USERNAME, email_utils.MAIL_PASSWORD)
+        _count(smtp_connections=1)
+        self._smtp = smtp
+        return smtp
+
+    async def send(self, message: EmailMessage):
+        smtp = await self.connect()
+        try:
+            await smtp.send_message(message)
+        except (aiosmtplib.SMTPServerDisconnected, ConnectionError, asyncio.TimeoutError):
+            # Drop the dead session so the next message reconnects
+            await self.close()
+            raise
+        finally:
+            self._last_used = time.monotonic()
+
+    async def close_if_idle(self):
+        if self._smtp is not None and time.monotonic() - self._last_used > EMAIL_SMTP_IDLE_TIMEOUT:
+            await self.close()
+
+    async def close(self):
+        smtp, self._smtp = self._smtp, None
+        if smtp is None or not smtp.is_connected:
+            return
+        try:
+            await smtp.quit()
+        except Exception:
+            smtp.close()
+
+
+def _claim(worker_id: str) -> List[dict]:
+    db = SessionLocal()
+    try:
+        email_job_crud.requeue_stale_jobs(db, EMAIL_LOCK_TIMEOUT)
+        return email_job_crud.claim_due_jobs(db, worker_id, EMAIL_BATCH_SIZE)
+    finally:
+        db.close()
+
+
+def _renew(worker_id: str, job_ids: List[int]):
+    db = SessionLocal()
+    try:
+        return email_job_crud.renew_claims(db, worker_id, job_ids)
+    finally:
+        db.close()
+
+
+def _record(sent_ids, failures):
+    db = SessionLocal()
+    try:
+        email_job_crud.record_results(db, sent_ids, failures)
+    finally:
+        db.close()
+
+
+async def send_batch(sender: SMTPSender, jobs: List[dict], worker_id: str):
+    """Send `jobs` over `sender`'s connection and return (sent_ids, failures) for record_results"""
+    sent_ids, failures = [], {}
+    started = time.perf_counter()
+    renewed = time.monotonic()
+    lost = set()
+
+    def fail(job, error, permanent):
+        attempts = job["attempts"] + 1
+        if permanent or attempts >= EMAIL_MAX_ATTEMPTS:
+            failures[job["id"]] = (repr(error), None)
+            _count(failed=1)
+        else:
+            retry_at = datetime.utcnow() + timedelta(seconds=retry_delay(attempts))
+            failures[job["id"]] = (repr(error), retry_at)
+            _count(retried=1)
+        print(f"Email job {job['id']} to {job['recipient']} failed (attempt {attempts}): {error}")
+
+    try:
+        await sender.connect()
+    except Exception as e:
+        # Server unreachable or refusing our login: the whole batch waits for a retry
+        for job in jobs:
+            fail(job, e, permanent=False)
+        _count(batches=1, send_seconds=time.perf_counter() - started)
+        return sent_ids, failures
+
+    for job in jobs:
+        if time.monotonic() - renewed > EMAIL_LOCK_TIMEOUT / 3:
+            # A batch of slow sends can outlast EMAIL_LOCK_TIMEOUT; keep requeue_stale_jobs
+            # from handing it to another worker. Sent jobs stay claimed until recorded.
+            claimed = [j["id"] for j in jobs]
+            try:
+                held = await asyncio.to_thread(_renew, worker_id, claimed)
+            except Exception as e:
+                print(f"Email worker {worker_id} could not renew its claim: {e}")
+            else:
+                renewed = time.monotonic()
+                lost = set(claimed) - held
+        if job["id"] in lost:
+            # Requeued after all; another worker sends it
+            continue
+        try:
+            await sender.send(_build_message(job))
+        except Exception as e:
+            fail(job, e, permanent=_is_permanent(e))
+            continue
+        sent_ids.append(job["id"])
+        latency = (datetime.utcnow() - job["created_at"]).total_seconds() if job["created_at"] else 0.0
+        with _stats_lock:
+            _stats["sent"] += 1
+            _stats["total_latency_seconds"] += latency
+            _stats["max_latency_seconds"] = max(_stats["max_latency_seconds"], latency)
+    _count(batches=1, send_seconds=time.perf_counter() - started)
+    return sent_ids, failures
+
+
+async def _worker(worker_id: str):
+    sender = SMTPSender()
+    try:
+        while True:
+            _wakeup.clear()
+            try:
+                jobs = await asyncio.to_thread(_claim, worker_id)
+                if jobs:
+                    sent_ids, failures = await send_batch(sender, jobs, worker_id)
+                    await asyncio.to_thread(_record, sent_ids, failures)
+                    continue
+            except Exception as e:
+                print(f"Email worker {worker_id} error: {e}")
+
+            await sender.close_if_idle()
+            try:
+                await asyncio.wait_for(_wakeup.wait(), EMAIL_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        await sender.close()
+
+
+def start_email_workers(count: int = EMAIL_WORKERS):
+    """Start `count` sender coroutines on the running loop. Call from the app's startup hook."""
+    global _wakeup, _loop
+    if _workers or count <= 0:
+        return
+    _loop = asyncio.get_running_loop()
+    _wakeup = asyncio.Event()
+    # Ids go in email_jobs.locked_by (64 characters). Keep the end of long hostnames,
+    # where container names carry their unique suffix.
+    prefix = f"{socket.gethostname()[-40:]}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    for i in range(count):
+        _workers.append(asyncio.create_task(_worker(f"{prefix}:{i}"), name=f"email-worker-{i}"))
+
+
+async def stop_email_workers():
+    global _loop
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    _loop = None
+
+
+def get_email_queue_stats() -> dict:
+    db = SessionLocal()
+    try:
+        stats = {"queue": email_job_crud.get_queue_counts(db)}
+    finally:
+        db.close()
+    with _stats_lock:
+        worker = dict(_stats)
+    worker["avg_latency_seconds"] = (
+        round(worker["total_latency_seconds"] / worker["sent"], 3) if worker["sent"] else 0.0
+    )
+    worker["messages_per_connection"] = (
+        round(worker["sent"] / worker["smtp_connections"], 2) if worker["smtp_connections"] else 0.0
+    )
+    for key in ("send_seconds", "total_latency_seconds", "max_latency_seconds"):
+        worker[key] = round(worker[key], 3)
+    worker.update(workers=len(_workers), batch_size=EMAIL_BATCH_SIZE, max_attempts=EMAIL_MAX_ATTEMPTS)
+    stats["worker"] = worker
+    return stats
@@ -1,5 +1,6 @@
 import os
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig
+import threading
+from typing import Tuple
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -10,54 +11,87 @@ MAIL_FROM = os.getenv("MAIL_FROM")
 MAIL_PORT = int(os.getenv("MAIL_PORT", 587))
 MAIL_SERVER = os.getenv("MAIL_SERVER", "smtp.gmail.com")
 
-# ❗ Agar env missing ho to app crash ho (GOOD)
-if not MAIL_USERNAME or not MAIL_PASSWORD or not MAIL_FROM:
-    raise RuntimeError("Email environment variables are not set")
 
-conf = ConnectionConfig(
-    MAIL_USERNAME=MAIL_USERNAME,
-    MAIL_PASSWORD=MAIL_PASSWORD,
-    MAIL_FROM=MAIL_FROM,
-    MAIL_PORT=MAIL_PORT,
-    MAIL_SERVER=MAIL_SERVER,
-    MAIL_STARTTLS=True,
-    MAIL_SSL_TLS=False,
-    USE_CREDENTIALS=True,
-    VALIDATE_CERTS=True,
-)
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes", "on")
 
-fm = FastMail(conf)
 
+# Transport settings, shared with the email queue workers. A local relay or the
+# stand-in in app/utils/smtp_stub.py runs with all of these off.
+MAIL_STARTTLS = _env_bool("MAIL_STARTTLS", True)
+MAIL_SSL_TLS = _env_bool("MAIL_SSL_TLS", False)
+MAIL_USE_CREDENTIALS = _env_bool("MAIL_USE_CREDENTIALS", True)
+MAIL_VALIDATE_CERTS = _env_bool("MAIL_VALIDATE_CERTS", True)
+
+_mailer = None
+_mailer_lock = threading.Lock()
+
+
+def check_mail_settings():
+    """Raise when sending is attempted without the MAIL_* settings; importing never fails"""
+    if not MAIL_FROM or (MAIL_USE_CREDENTIALS and (not MAIL_USERNAME or not MAIL_PASSWORD)):
+        raise RuntimeError("Email environment variables are not set")
+
+
+def get_mailer():
+    """
+    FastMail client, built on first use.
+
+    fastapi_mail pulls in jinja2 and pydantic-settings, so it is only imported
+    once an email is actually sent directly rather than through the queue.
+    """
+    global _mailer
+    if _mailer is None:
+        with _mailer_lock:
+            if _mailer is None:
+                check_mail_settings()
+                from fastapi_mail import FastMail, ConnectionConfig
+
+                conf = ConnectionConfig(
+                    MAIL_USERNAME=MAIL_USERNAME or "",
+                    MAIL_PASSWORD=MAIL_PASSWORD or "",
+                    MAIL_FROM=MAIL_FROM,
+                    MAIL_PORT=MAIL_PORT,
+                    MAIL_SERVER=MAIL_SERVER,
+                    MAIL_STARTTLS=MAIL_STARTTLS,
+                    MAIL_SSL_TLS=MAIL_SSL_TLS,
+                    USE_CREDENTIALS=MAIL_USE_CREDENTIALS,
+                    VALIDATE_CERTS=MAIL_VALIDATE_CERTS,
+                )
+                _mailer = FastMail(conf)
+    return _mailer
+
+
+async def _send(email: str, subject: str, body: str):
+    from fastapi_mail import MessageSchema
+
+    message = MessageSchema(subject=subject, recipients=[email], body=body, subtype="html")
+    await get_mailer().send_message(message)
 
-async def send_verification_email(email: str, verification_token: str):
-    print("EMAIL FUNC CALLED FOR:", email)
 
-    message = MessageSchema(
-        subject="Verify Your Email",
-        recipients=[email],
-        body=f"""
+# Subject and HTML body of each transactional email, used both for direct sends
+# below and for jobs put on the queue in app/utils/email_queue.py
+
+def verification_email(verification_token: str) -> Tuple[str, str]:
+    return "Verify Your Email", f"""
         <h3>Verify your email</h3>
         <p>Your verification code is: <strong>{verification_token}</strong></p>
-        """,
-        subtype="html",
-    )
-
-    await fm.send_message(message)
+        """
 
 
-async def send_password_reset_email(email: str, reset_token: str):
+def password_reset_email(reset_token: str) -> Tuple[str, str]:
     reset_url = (
         f"http://127.0.0.1:8000/users/reset-password/?token={reset_token}"
     )
-
-    message = MessageSchema(
-        subject="Reset Password",
-        recipients=[email],
-        body=f"""
+    return "Reset Password", f"""
         <h3>Reset Password</h3>
         <a href="{reset_url}">Reset Password</a>
-        """,
-        subtype="html",
-    )
+        """
 
-    await fm.send_message(message)
+
+async def send_verification_email(email: str, verification_token: str):
+    await _send(email, *verification_email(verification_token))
+
+
+async def send_password_reset_email(email: str, reset_token: str):
+    await _send(email, *password_reset_email(reset_token))
@@ -1,85 +1,201 @@
 """
 File upload utilities for handling product images
+
+Uploads are streamed in UPLOAD_CHUNK_SIZE pieces: the size limit is enforced on
+the bytes actually read, the type comes from the file's magic bytes rather than
+its name, and disk writes run on the threadpool into a temp file. The finished
+file goes to the storage backend (app.utils.storage): renamed into place locally
+or uploaded to S3. Files are named after the SHA-256 of their content, so the
+same image uploaded twice is stored once.
 """
+import hashlib
 import os
-import shutil
+import re
+import tempfile
 from pathlib import Path
+from typing import Optional
 from fastapi import UploadFile, HTTPException, status
-from datetime import datetime
-import uuid
+from fastapi.concurrency import run_in_threadpool
+from app.utils.storage import StorageError, get_storage
 
 
 UPLOAD_DIR = Path("uploads/products")
+UPLOAD_URL_PREFIX = "/uploads/products/"
 ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
-MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
+CONTENT_TYPES = {".jpg": "image/jpeg", ".png": "image/png", ".gif": "image/gif", ".webp": "image/webp"}
+MAX_FILE_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", 5 * 1024 * 1024))  # 5MB
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 256 * 1024))
+
+# save_product_image names files after the first 32 hex digits of their SHA-256
+UPLOAD_KEY_PATTERN = re.compile(r"[0-9a-f]{32}\.(?:jpg|png|gif|webp)")
+# Derived images from app.utils.image_variants: <hash>.<size>.<format>
+VARIANT_KEY_PATTERN = re.compile(r"([0-9a-f]{32})\.[\w-]+\.\w+")
 
 # Create upload directory if it doesn't exist
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
 
+def sniff_image_type(header: bytes) -> Optional[str]:
+    """Extension for the image format `header` starts with, or None if it is not an allowed image"""
+    if header.startswith(b"\xff\xd8\xff"):
+        return ".jpg"
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return ".png"
+    if header[:6] in (b"GIF87a", b"GIF89a"):
+        return ".gif"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return ".webp"
+    return None
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"File size exceeds {MAX_FILE_SIZE / 1024 / 1024}MB limit"
+    )
+
+
 def validate_image_file(file: UploadFile) -> bool:
-    """Validate image file"""
+    """Cheap pre-check on the declared size; the real limit is enforced while streaming"""
     if file.size and file.size > MAX_FILE_SIZE:
-        raise HTTPException(
-            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-            detail=f"File size exceeds {MAX_FILE_SIZE / 1024 / 1024}MB limit"
-        )
-    
-    file_ext = Path(file.filename).suffix.lower()
-    if file_ext not in ALLOWED_EXTENSIONS:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"File type not allowed. Allowed: {', '.join(ALLOWED_EXTENSIONS)}"
-        )
-    
+        raise _too_large()
     return True
 
 
+def _write_chunk(buffer, hasher, chunk: bytes):
+    # Hash and write together so each chunk costs a single threadpool hop
+    hasher.update(chunk)
+    buffer.write(chunk)
+
+
+def _finish(buffer):
+    buffer.flush()
+    os.fsync(buffer.fileno())
+    buffer.close()
+
+
+def _discard(buffer, temp_path: str):
+    buffer.close()
+    try:
+        os.unlink(temp_path)
+    except FileNotFoundError:
+        pass
+
+
 async def save_product_image(file: UploadFile) -> str:
     """
     Save uploaded product image and return the file path/URL
-    
+
     Args:
         file: UploadFile from FastAPI
-        
+
     Returns:
         Relative path to saved image
     """
     validate_image_file(file)
-    
-    # Generate unique filename
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    unique_id = str(uuid.uuid4())[:8]
-    file_ext = Path(file.filename).suffix.lower()
-    filename = f"{timestamp}_{unique_id}{file_ext}"
-    
-    file_path = UPLOAD_DIR / filename
-    
+
+    header = await file.read(UPLOAD_CHUNK_SIZE)
+    extension = sniff_image_type(header)
+    if extension is None or extension not in ALLOWED_EXTENSIONS:
+        await file.close()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"File type not allowed. Allowed: {', '.join(sorted(ALLOWED_EXTENSIONS))}"
+        )
+
+    # The temp file lives next to the target so the final rename is atomic
+    fd, temp_path = tempfile.mkstemp(dir=UPLOAD_DIR, prefix=".upload-", suffix=".part")
+    buffer = os.fdopen(fd, "wb")
+    hasher = hashlib.sha256()
+    size = 0
     try:
-        # Save file
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # Return relative URL path
-        relative_path = f"/uploads/products/{filename}"
-        return relative_path
-    
+        chunk = header
+        while chunk:
+            size += len(chunk)
+            if size > MAX_FILE_SIZE:
+                raise _too_large()
+            await run_in_threadpool(_write_chunk, buffer, hasher, chunk)
+            chunk = await file.read(UPLOAD_CHUNK_SIZE)
+
+        await run_in_threadpool(_finish, buffer)
+        filename = f"{hasher.hexdigest()[:32]}{extension}"
+        # Relative URL path for local storage, the object URL for S3
+        return await get_storage().aput_file(Path(temp_path), filename, CONTENT_TYPES[extension])
+
+    except HTTPException:
+        await run_in_threadpool(_discard, buffer, temp_path)
+        raise
+    except StorageError as e:
+        await run_in_threadpool(_discard, buffer, temp_path)
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=f"Failed to store image: {str(e)}"
+        )
     except Exception as e:
+        await run_in_threadpool(_discard, buffer, temp_path)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to save image: {str(e)}"
         )
     finally:
-        file.file.close()
+        await file.close()
+
+
+def upload_key(image_url: Optional[str]) -> Optional[str]:
+    """The storage key of an image save_product_image stored, or None for any other URL"""
+    if not image_url:
+        return None
+    if "://" in image_url:
+        key = get_storage().key_for(image_url)
+    elif image_url.startswith(UPLOAD_URL_PREFIX):
+        key = image_url[len(UPLOAD_URL_PREFIX):]
+    else:
+        return None
+    if key is None or not UPLOAD_KEY_PATTERN.fullmatch(key):
+        return None
+    return key
+
+
+def local_upload_path(image_url: Optional[str]) -> Optional[Path]:
+    """Where a locally stored upload lives, or None unless it is one of ours inside UPLOAD_DIR"""
+    if not image_url or not image_url.startswith(UPLOAD_URL_PREFIX):
+        return None
+    key = upload_key(image_url)
+    if key is None:
+        return None
+    path = (UPLOAD_DIR / key).resolve()
+    if path.parent != UPLOAD_DIR.resolve():
+        return None
+    return path
 
 
 def delete_product_image(image_path: str) -> bool:
-    """Delete product image from storage"""
+    """
+    Delete product image from storage
+
+    Also removes the image's derived variants. Stored files are shared by every
+    product with the same image, so callers should only delete once no product
+    references the path any more. Image URLs come from product rows that clients
+    can write, so anything that is not a content-addressed upload is left alone.
+    """
     try:
-        if image_path.startswith("/uploads/products/"):
-            image_path = image_path.replace("/uploads/products/", "")
-        
-        file_path = UPLOAD_DIR / image_path
+        if "://" in image_path:
+            # Stored by a remote backend such as S3
+            if upload_key(image_path) is None:
+                return False
+            return get_storage().delete_url(image_path)
+
+        file_path = local_upload_path(image_path)
+        if file_path is None:
+            return False
+        # Thumbnails and WebP/AVIF variants are stored as <hash>.<size>.<format>
+        with os.scandir(file_path.parent) as entries:
+            variants = [
+                entry.path for entry in entries
+                if (match := VARIANT_KEY_PATTERN.fullmatch(entry.name)) and match.group(1) == file_path.stem
+            ]
+        for variant in variants:
+            Path(variant).unlink(missing_ok=True)
         if file_path.exists():
             file_path.unlink()
             return True
@@ -0,0 +1,225 @@
+"""
+Derived product images: fixed-size thumbnails and full-size copies in WebP/AVIF
+
+After an upload is stored, schedule_variants() resizes and re-encodes it in a
+process pool (Pillow is CPU bound and holds the GIL) off the request path, then
+records the variant URLs on the product. Variants are named after the original's
+content hash, e.g. <hash>.thumb.webp next to <hash>.png, so a deduplicated upload
+reuses the variants already on disk and delete_product_image can find them.
+A size with edge 0 keeps the original dimensions; those <hash>.full.<format>
+copies are what the /uploads mount serves to clients that accept the format.
+
+Pillow is optional; without it products simply keep only their original image.
+Products uploaded before this existed can be backfilled with
+
+    python -m app.utils.image_variants
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+from fastapi.concurrency import run_in_threadpool
+from database import SessionLocal
+from app.crud import product as product_crud
+from app.models.product import Product
+from app.utils.file_handler import UPLOAD_URL_PREFIX, local_upload_path
+
+
+def _parse_sizes(value: str) -> Dict[str, int]:
+    sizes = {}
+    for item in value.split(","):
+        name, _, edge = item.strip().partition(":")
+        if name and edge:
+            sizes[name] = int(edge)
+    return sizes
+
+
+# name:longest-edge pairs, 0 for the original size; the first one becomes the product's thumbnail_url
+IMAGE_VARIANT_SIZES = _parse_sizes(os.getenv("IMAGE_VARIANT_SIZES", "thumb:256,medium:800,full:0"))
+IMAGE_VARIANT_FORMATS = [f.strip().lower() for f in os.getenv("IMAGE_VARIANT_FORMATS", "webp,avif").split(",") if f.strip()]
+IMAGE_VARIANT_QUALITY = int(os.getenv("IMAGE_VARIANT_QUALITY", 80))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", min(2, os.cpu_count() or 1)))
+
+_formats: Optional[List[str]] = None
+_executor = None
+_executor_lock = threading.Lock()
+_tasks: Set[asyncio.Task] = set()
+_stats_lock = threading.Lock()
+_stats = {"built": 0, "failed": 0, "in_flight": 0, "total_seconds": 0.0}
+
+
+def available_formats() -> List[str]:
+    """IMAGE_VARIANT_FORMATS this Pillow build can encode; empty when Pillow is not installed"""
+    global _formats
+    if _formats is None:
+        try:
+            from PIL import features
+        except ImportError:
+            print("Pillow is not installed, product image variants are disabled")
+            _formats = []
+        else:
+            _formats = [fmt for fmt in IMAGE_VARIANT_FORMATS if features.check(fmt)]
+    return _formats
+
+
+def variant_name(size_name: str, fmt: str) -> str:
+    return f"{size_name}.{fmt}"
+
+
+def build_variants(source: str, sizes: Dict[str, int], formats: List[str], quality: int) -> Dict[str, str]:
+    """Write every size x format variant of `source` that is not on disk yet; runs in the process pool"""
+    from PIL import Image, ImageOps
+
+    source_path = Path(source)
+    source_size = source_path.stat().st_size
+    variants = {}
+    with Image.open(source_path) as original:
+        animated = getattr(original, "is_animated", False)
+        # First frame of animated images, rotated as the camera intended
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info or image.mode in ("LA", "PA") else "RGB")
+
+        for size_name, edge in sizes.items():
+            # A full-size still would replace an animation, and re-encoding into
+            # the source's own format gains nothing
+            if edge <= 0 and animated:
+                continue
+            resized = None
+            for fmt in formats:
+                if edge <= 0 and source_path.suffix.lstrip(".") == fmt:
+                    continue
+                target = source_path.with_name(f"{source_path.stem}.{size_name}.{fmt}")
+                if not target.exists():
+                    if resized is None:
+                        resized = image.copy()
+                        if edge > 0:
+                            # Shrinks to fit edge x edge keeping the aspect ratio, never enlarges
+                            resized.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+                    temp = target.with_name(f".{target.name}.{os.getpid()}.part")
+                    resized.save(temp, format=fmt.upper(), quality=quality)
+                    if edge <= 0 and temp.stat().st_size >= source_size:
+                        # Only worth serving in place of the original if it is smaller
+                        temp.unlink()
+                        continue
+                    os.replace(temp, target)
+                variants[variant_name(size_name, fmt)] = f"{UPLOAD_URL_PREFIX}{target.name}"
+    return variants
+
+
+def pick_thumbnail(variants: Dict[str, str]) -> Optional[str]:
+    if not variants or not IMAGE_VARIANT_SIZES:
+        return None
+    size_name = next(iter(IMAGE_VARIANT_SIZES))
+    # WebP has the widest browser support, so it backs the single thumbnail_url
+    for fmt in ["webp"] + available_formats():
+        url = variants.get(variant_name(size_name, fmt))
+        if url:
+            return url
+    return None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    for task in list(_tasks):
+        task.cancel()
+    if _executor is not None:
+        # Drop queued builds but let running ones finish, they take well under a second
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+
+
+def _source_path(image_url: Optional[str]) -> Optional[Path]:
+    # Only files stored by save_product_image; remote (S3) URLs and anything else are left alone
+    return local_upload_path(image_url)
+
+
+def _record(product_id: int, image_url: str, variants: Dict[str, str]):
+    db = SessionLocal()
+    try:
+        product_crud.set_product_image_variants(
+            db, product_id, image_url, thumbnail_url=pick_thumbnail(variants), variants=variants
+        )
+    finally:
+        db.close()
+
+
+async def generate_variants(product_id: int, image_url: str):
+    source = _source_path(image_url)
+    formats = available_formats()
+    if source is None or not formats or not IMAGE_VARIANT_SIZES:
+        return
+
+    with _stats_lock:
+        _stats["in_flight"] += 1
+    started = time.perf_counter()
+    try:
+        variants = await asyncio.get_running_loop().run_in_executor(
+            get_executor(), build_variants, str(source), IMAGE_VARIANT_SIZES, formats, IMAGE_VARIANT_QUALITY
+        )
+        await run_in_threadpool(_record, product_id, image_url, variants)
+        with _stats_lock:
+            _stats["built"] += 1
+    except Exception as e:
+        # The product keeps serving its original image
+        with _stats_lock:
+            _stats["failed"] += 1
+        print(f"Failed to build image variants for product {product_id}: {e}")
+    finally:
+        with _stats_lock:
+            _stats["in_flight"] -= 1
+            _stats["total_seconds"] += time.perf_counter() - started
+
+
+def schedule_variants(product_id: int, image_url: str):
+    """Build the variants for a freshly stored image in the background; call from a running event loop"""
+    if _source_path(image_url) is None or not available_formats():
+        return
+    task = asyncio.get_running_loop().create_task(generate_variants(product_id, image_url))
+    # Keep a reference so the task is not garbage collected mid-flight
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+def get_variant_stats() -> dict:
+    with _stats_lock:
+        stats = dict(_stats)
+    finished = stats["built"] + stats["failed"]
+    stats["avg_seconds"] = round(stats["total_seconds"] / finished, 4) if finished else 0.0
+    stats["total_seconds"] = round(stats["total_seconds"], 4)
+    stats.update(
+        workers=IMAGE_WORKERS,
+        sizes=IMAGE_VARIANT_SIZES,
+        formats=available_formats(),
+    )
+    return stats
+
+
+async def _backfill():
+    db = SessionLocal()
+    try:
+        pending = db.query(Product.id, Product.image_url).filter(
+            Product.image_url.like(f"{UPLOAD_URL_PREFIX}%"), Product.thumbnail_url.is_(None)
+        ).all()
+    finally:
+        db.close()
+    print(f"Building variants for {len(pending)} products")
+    await asyncio.gather(*(generate_variants(product_id, image_url) for product_id, image_url in pending))
+    print(get_variant_stats())
+    shutdown_executor()
+
+
+if __name__ == "__main__":
+    asyncio.run(_backfill())
@@ -3,12 +3,27 @@ from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from pydantic import BaseModel
+from app.utils.cache import TTLCache
+import base64
+import hashlib
+import hmac
+import json
 import os
+import time
 
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-this-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", 10000))
+
+# Verified tokens keyed by sha256(token); each entry expires with the token's exp.
+# Always in-process: tokens never change, so there is nothing to invalidate across workers.
+token_cache = TTLCache("verified_tokens", maxsize=JWT_CACHE_SIZE, ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
+# HMAC state with the key already absorbed; copy() per token skips the key schedule
+_hs256_mac = hmac.new(SECRET_KEY.encode(), digestmod=hashlib.sha256)
+
 
 class TokenData(BaseModel):
     user_id: int
@@ -35,21 +50,69 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
-from jose import JWTError, jwt
+def _b64url_decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
 
-def verify_token(token: str) -> Optional[TokenData]:
+
+def _decode_hs256(token: str) -> Optional[dict]:
+    """Verify an HS256 token's signature, exp and nbf without python-jose; None if anything is off."""
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        print("JWT PAYLOAD:", payload)
+        signing_input, _, signature = token.rpartition(".")
+        header_segment, _, payload_segment = signing_input.partition(".")
+        header = json.loads(_b64url_decode(header_segment))
+        if not isinstance(header, dict) or header.get("alg") != "HS256":
+            return None
+
+        mac = _hs256_mac.copy()
+        mac.update(signing_input.encode())
+        if not hmac.compare_digest(mac.digest(), _b64url_decode(signature)):
+            return None
 
-        user_id = payload.get("user_id")
-        email = payload.get("email")
+        payload = json.loads(_b64url_decode(payload_segment))
+    except (ValueError, TypeError, UnicodeError):
+        return None
 
-        if user_id is None or email is None:
+    if not isinstance(payload, dict):
+        return None
+    now = time.time()
+    for claim in ("exp", "nbf"):
+        value = payload.get(claim)
+        if value is not None and not isinstance(value, (int, float)):
             return None
+    if payload.get("exp") is not None and payload["exp"] <= now:
+        return None
+    if payload.get("nbf") is not None and payload["nbf"] > now:
+        return None
+    return payload
 
-        return TokenData(user_id=user_id, email=email)
 
+def _decode_jose(token: str) -> Optional[dict]:
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
     except JWTError:
         return None
 
+
+def verify_token(token: str) -> Optional[TokenData]:
+    cache_key = hashlib.sha256(token.encode()).digest()
+    token_data = token_cache.get(cache_key)
+    if token_data is not None:
+        return token_data
+
+    payload = _decode_hs256(token) if ALGORITHM == "HS256" else _decode_jose(token)
+    if payload is None:
+        return None
+
+    user_id = payload.get("user_id")
+    email = payload.get("email")
+
+    if user_id is None or email is None:
+        return None
+
+    token_data = TokenData(user_id=user_id, email=email)
+
+    exp = payload.get("exp")
+    ttl = min(exp - time.time(), token_cache.ttl) if exp is not None else token_cache.ttl
+    if ttl > 0:
+        token_cache.set(cache_key, token_data, ttl=ttl)
+    return token_data
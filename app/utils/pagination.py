@@ -0,0 +1,52 @@
+"""
+Keyset (cursor) pagination helpers
+"""
+import base64
+import json
+from typing import Any, List, Optional, Tuple
+from fastapi import HTTPException, status
+
+
+def encode_cursor(values: dict) -> str:
+    """Encode the sort key of the last row of a page into an opaque cursor"""
+    raw = json.dumps(values, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    """Decode a cursor produced by encode_cursor, rejecting anything malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, dict):
+            raise ValueError("cursor is not an object")
+        return values
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+
+
+def paginate_by_id(query, id_column, after: Optional[str], limit: int) -> Tuple[List[Any], Optional[str]]:
+    """
+    Return one page of `query` ordered by `id_column` plus the cursor of the next page.
+
+    The page is located with `id > last_id` instead of OFFSET, so the database
+    seeks straight into the index and the cost stays the same on every page.
+    """
+    if after:
+        last_id = decode_cursor(after).get("id")
+        if not isinstance(last_id, int):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid pagination cursor"
+            )
+        query = query.filter(id_column > last_id)
+
+    # Fetch one extra row to learn whether another page exists
+    rows = query.order_by(id_column).limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor({"id": rows[-1].id})
+    return rows, None
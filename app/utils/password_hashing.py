@@ -0,0 +1,125 @@
+"""
+Password hashing off the request path
+
+bcrypt costs 100-300 ms of CPU per call. Running it in the Starlette threadpool
+lets a login burst starve every other sync endpoint, so hashing and verification
+run in their own size-bounded pool (threads by default, or processes to get past
+the GIL) and the async wrappers below are awaited by the user routers.
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+
+PASSWORD_HASH_ROUNDS = int(os.getenv("PASSWORD_HASH_ROUNDS", 12))
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread").lower()  # "thread" or "process"
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+# Requests beyond this many outstanding hash jobs get a 503 instead of queueing forever
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", 256))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=PASSWORD_HASH_ROUNDS)
+
+
+def hash_password_sync(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def verify_password_sync(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+def _hash_rounds(hashed_password: str) -> int:
+    # bcrypt hashes look like $2b$12$<salt+digest>
+    try:
+        return int(hashed_password.split("$")[2])
+    except (IndexError, ValueError):
+        return -1
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    """True when the stored hash uses another scheme or cost factor than PASSWORD_HASH_ROUNDS"""
+    return pwd_context.needs_update(hashed_password) or _hash_rounds(hashed_password) != PASSWORD_HASH_ROUNDS
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {
+    "submitted": 0,
+    "completed": 0,
+    "rejected": 0,
+    "in_flight": 0,
+    "peak_in_flight": 0,
+    "total_seconds": 0.0,
+}
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                if PASSWORD_HASH_EXECUTOR == "process":
+                    _executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+                else:
+                    _executor = ThreadPoolExecutor(
+                        max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+                    )
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def _run(fn, *args):
+    with _stats_lock:
+        if _stats["in_flight"] >= PASSWORD_HASH_MAX_QUEUE:
+            _stats["rejected"] += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many concurrent authentication requests, retry shortly",
+                headers={"Retry-After": "1"},
+            )
+        _stats["submitted"] += 1
+        _stats["in_flight"] += 1
+        _stats["peak_in_flight"] = max(_stats["peak_in_flight"], _stats["in_flight"])
+
+    started = time.perf_counter()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(get_executor(), fn, *args)
+    finally:
+        with _stats_lock:
+            _stats["in_flight"] -= 1
+            _stats["completed"] += 1
+            _stats["total_seconds"] += time.perf_counter() - started
+
+
+async def hash_password(password: str) -> str:
+    return await _run(hash_password_sync, password)
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await _run(verify_password_sync, plain_password, hashed_password)
+
+
+def get_hashing_stats() -> dict:
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["queue_depth"] = max(0, stats["in_flight"] - PASSWORD_HASH_WORKERS)
+    stats["avg_seconds"] = round(stats["total_seconds"] / stats["completed"], 4) if stats["completed"] else 0.0
+    stats["total_seconds"] = round(stats["total_seconds"], 4)
+    stats.update(
+        executor=PASSWORD_HASH_EXECUTOR,
+        workers=PASSWORD_HASH_WORKERS,
+        max_queue=PASSWORD_HASH_MAX_QUEUE,
+        rounds=PASSWORD_HASH_ROUNDS,
+    )
+    return stats
@@ -0,0 +1,41 @@
+"""
+SQL query counting, used to keep endpoints free of N+1 loading
+
+Example:
+    with assert_max_queries(engine, 3):
+        client.get("/cart/1/", headers=auth)
+"""
+from contextlib import contextmanager
+from sqlalchemy import event
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+        self.statements.append(statement)
+
+
+@contextmanager
+def count_queries(engine):
+    """Count the statements executed on `engine` (sync or async) inside the block"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    counter = QueryCounter()
+    event.listen(sync_engine, "before_cursor_execute", counter)
+    try:
+        yield counter
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", counter)
+
+
+@contextmanager
+def assert_max_queries(engine, limit: int):
+    """Fail with the offending SQL when the block runs more than `limit` statements"""
+    with count_queries(engine) as counter:
+        yield counter
+    if counter.count > limit:
+        statements = "\n".join(counter.statements)
+        raise AssertionError(f"Expected at most {limit} queries, got {counter.count}:\n{statements}")
@@ -0,0 +1,133 @@
+"""
+Local SMTP stand-in
+
+A tiny in-process SMTP server for tests and local development. It speaks just
+enough SMTP (EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP, QUIT) for aiosmtplib and
+FastMail, keeps every accepted message in memory and counts connections, so the
+email queue's batching and connection reuse can be checked without a real relay.
+
+Point the app at it with MAIL_SERVER=127.0.0.1, MAIL_PORT=<port>,
+MAIL_STARTTLS=false and MAIL_USE_CREDENTIALS=false, or run it on its own:
+
+    python -m app.utils.smtp_stub --port 1025
+"""
+import argparse
+import asyncio
+from email import message_from_bytes, policy
+from email.message import EmailMessage
+from typing import List, Optional
+
+
+class LocalSMTPServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        self.messages: List[EmailMessage] = []
+        self.connections = 0
+        # Reply codes handed out, one per RCPT, before accepting again (e.g. [451, 451] or [550])
+        self.rcpt_failures: List[int] = []
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        # port=0 picks a free port; report the one we got
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+
+        def reply(line: str):
+            writer.write(f"{line}\r\n".encode())
+
+        reply("220 localhost SMTP stand-in ready")
+        recipients = []
+        try:
+            while True:
+                await writer.drain()
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode(errors="replace").strip()
+                verb = command[:4].upper()
+
+                if verb == "EHLO":
+                    reply("250-localhost")
+                    reply("250-8BITMIME")
+                    reply("250 SMTPUTF8")
+                elif verb == "HELO":
+                    reply("250 localhost")
+                elif verb == "MAIL":
+                    recipients = []
+                    reply("250 OK")
+                elif verb == "RCPT":
+                    if self.rcpt_failures:
+                        code = self.rcpt_failures.pop(0)
+                        reply(f"{code} Recipient rejected by stand-in")
+                    else:
+                        recipients.append(command.partition(":")[2].strip(" <>"))
+                        reply("250 OK")
+                elif verb == "DATA":
+                    if not recipients:
+                        reply("503 No valid recipients")
+                        continue
+                    reply("354 End data with <CR><LF>.<CR><LF>")
+                    await writer.drain()
+                    lines = []
+                    while True:
+                        data_line = await reader.readline()
+                        if not data_line or data_line in (b".\r\n", b".\n"):
+                            break
+                        # Undo dot-stuffing
+                        lines.append(data_line[1:] if data_line.startswith(b"..") else data_line)
+                    self.messages.append(message_from_bytes(b"".join(lines), policy=policy.default))
+                    recipients = []
+                    reply("250 OK queued")
+                elif verb == "RSET":
+                    recipients = []
+                    reply("250 OK")
+                elif verb == "NOOP":
+                    reply("250 OK")
+                elif verb == "QUIT":
+                    reply("221 Bye")
+                    await writer.drain()
+                    break
+                else:
+                    reply("502 Command not implemented")
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def _serve(host: str, port: int):
+    server = await LocalSMTPServer(host, port).start()
+    print(f"SMTP stand-in listening on {server.host}:{server.port}")
+    try:
+        while True:
+            count = len(server.messages)
+            await asyncio.sleep(1)
+            for message in server.messages[count:]:
+                print(f"Received: to={message['To']} subject={message['Subject']!r}")
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the local SMTP stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1025)
+    args = parser.parse_args()
+    asyncio.run(_serve(args.host, args.port))
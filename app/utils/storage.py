@@ -0,0 +1,367 @@
+"""
+Storage backends for uploaded files
+
+save_product_image streams an upload into a temp file and then hands it to the
+configured backend (STORAGE_BACKEND):
+
+* "local"  - renamed into uploads/products and served by the /uploads mount
+* "s3"     - uploaded to S3_BUCKET with boto3's managed transfer: objects above
+  S3_MULTIPART_THRESHOLD go up as a multipart upload whose S3_PART_SIZE parts are
+  sent in parallel on S3_PART_CONCURRENCY threads, and botocore retries
+  throttling/5xx with adaptive backoff. S3_ENDPOINT_URL points it at MinIO or a
+  moto server instead of AWS.
+* "memory" - keeps objects in a dict; a stand-in for tests
+
+Uploads run on a dedicated pool of STORAGE_UPLOAD_WORKERS threads, which both
+keeps them off the event loop and caps how many run at once. Failures raise
+StorageError instead of being swallowed.
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional
+
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local").lower()
+STORAGE_UPLOAD_WORKERS = int(os.getenv("STORAGE_UPLOAD_WORKERS", 4))
+
+S3_BUCKET = os.getenv("S3_BUCKET", "fast-api-testing")
+S3_REGION = os.getenv("S3_REGION", os.getenv("REGION"))
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")
+S3_KEY_PREFIX = os.getenv("S3_KEY_PREFIX", "laiba/")
+# Public base URL of the bucket (e.g. a CDN); defaults to the virtual-hosted S3 URL
+S3_PUBLIC_URL = os.getenv("S3_PUBLIC_URL")
+S3_PART_SIZE = int(os.getenv("S3_PART_SIZE", 8 * 1024 * 1024))
+S3_MULTIPART_THRESHOLD = int(os.getenv("S3_MULTIPART_THRESHOLD", 8 * 1024 * 1024))
+S3_PART_CONCURRENCY = int(os.getenv("S3_PART_CONCURRENCY", 4))
+S3_MAX_ATTEMPTS = int(os.getenv("S3_MAX_ATTEMPTS", 5))
+
+
+class StorageError(Exception):
+    """Raised when a backend fails to store or delete an object"""
+
+
+class StorageBackend:
+    name = "base"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {
+            "uploads": 0,
+            "deduplicated": 0,
+            "errors": 0,
+            "in_flight": 0,
+            "bytes": 0,
+            "total_seconds": 0.0,
+            "max_seconds": 0.0,
+            "deletes": 0,
+        }
+
+    # Implemented by backends; blocking, called on the upload pool
+
+    def _exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def _put_file(self, path: Path, key: str, content_type: Optional[str]):
+        raise NotImplementedError
+
+    def _delete(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def url_for(self, key: str) -> str:
+        raise NotImplementedError
+
+    def key_for(self, url: str) -> Optional[str]:
+        """The key behind a URL this backend produced, or None if it is not ours"""
+        raise NotImplementedError
+
+    def put_file(self, path: Path, key: str, content_type: Optional[str] = None) -> str:
+        """
+        Store the file at `path` under `key` and return its URL. Blocking.
+
+        `path` is consumed: it is moved into place or removed once uploaded.
+        Keys are content hashes, so an existing object is kept as-is.
+        """
+        path = Path(path)
+        size = path.stat().st_size
+        with self._lock:
+            self._stats["in_flight"] += 1
+        started = time.perf_counter()
+        try:
+            if self._exists(key):
+                with self._lock:
+                    self._stats["deduplicated"] += 1
+                path.unlink(missing_ok=True)
+            else:
+                self._put_file(path, key, content_type)
+                elapsed = time.perf_counter() - started
+                with self._lock:
+                    self._stats["uploads"] += 1
+                    self._stats["bytes"] += size
+                    self._stats["total_seconds"] += elapsed
+                    self._stats["max_seconds"] = max(self._stats["max_seconds"], elapsed)
+            return self.url_for(key)
+        except StorageError:
+            with self._lock:
+                self._stats["errors"] += 1
+            raise
+        except Exception as e:
+            with self._lock:
+                self._stats["errors"] += 1
+            raise StorageError(f"{self.name} upload of {key} failed: {e}") from e
+        finally:
+            with self._lock:
+                self._stats["in_flight"] -= 1
+
+    async def aput_file(self, path: Path, key: str, content_type: Optional[str] = None) -> str:
+        return await asyncio.get_running_loop().run_in_executor(
+            get_upload_executor(), self.put_file, path, key, content_type
+        )
+
+    def delete_url(self, url: str) -> bool:
+        key = self.key_for(url)
+        if key is None:
+            return False
+        try:
+            deleted = self._delete(key)
+        except Exception as e:
+            with self._lock:
+                self._stats["errors"] += 1
+            raise StorageError(f"{self.name} delete of {key} failed: {e}") from e
+        with self._lock:
+            self._stats["deletes"] += 1
+        return deleted
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["avg_seconds"] = round(stats["total_seconds"] / stats["uploads"], 4) if stats["uploads"] else 0.0
+        stats["throughput_mb_s"] = (
+            round(stats["bytes"] / stats["total_seconds"] / 1024 / 1024, 2) if stats["total_seconds"] else 0.0
+        )
+        stats["total_seconds"] = round(stats["total_seconds"], 4)
+        stats["max_seconds"] = round(stats["max_seconds"], 4)
+        stats["backend"] = self.name
+        stats["upload_workers"] = STORAGE_UPLOAD_WORKERS
+        return stats
+
+
+class LocalStorage(StorageBackend):
+    name = "local"
+
+    def __init__(self, root: Path, url_prefix: str):
+        super().__init__()
+        self.root = Path(root)
+        self.url_prefix = url_prefix
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _exists(self, key: str) -> bool:
+        return (self.root / key).exists()
+
+    def _put_file(self, path: Path, key: str, content_type: Optional[str]):
+        # Same filesystem as the temp file, so this is an atomic rename
+        os.replace(path, self.root / key)
+
+    def _delete(self, key: str) -> bool:
+        target = self.root / key
+        if target.exists():
+            target.unlink()
+            return True
+        return False
+
+    def url_for(self, key: str) -> str:
+        return f"{self.url_prefix}{key}"
+
+    def key_for(self, url: str) -> Optional[str]:
+        if url.startswith(self.url_prefix):
+            return url[len(self.url_prefix):]
+        return None
+
+
+class MemoryStorage(StorageBackend):
+    """Keeps objects in memory; stands in for S3 in tests"""
+
+    name = "memory"
+
+    def __init__(self, base_url: str = "memory://uploads/"):
+        super().__init__()
+        self.base_url = base_url
+        self.objects: Dict[str, bytes] = {}
+        self.content_types: Dict[str, Optional[str]] = {}
+
+    def _exists(self, key: str) -> bool:
+        return key in self.objects
+
+    def _put_file(self, path: Path, key: str, content_type: Optional[str]):
+        self.objects[key] = path.read_bytes()
+        self.content_types[key] = content_type
+        path.unlink()
+
+    def _delete(self, key: str) -> bool:
+        self.content_types.pop(key, None)
+        return self.objects.pop(key, None) is not None
+
+    def url_for(self, key: str) -> str:
+        return f"{self.base_url}{key}"
+
+    def key_for(self, url: str) -> Optional[str]:
+        if url.startswith(self.base_url):
+            return url[len(self.base_url):]
+        return None
+
+
+class S3Storage(StorageBackend):
+    name = "s3"
+
+    def __init__(
+        self,
+        bucket: str = S3_BUCKET,
+        region: Optional[str] = S3_REGION,
+        key_prefix: str = S3_KEY_PREFIX,
+        endpoint_url: Optional[str] = S3_ENDPOINT_URL,
+        public_url: Optional[str] = S3_PUBLIC_URL,
+        client=None,
+    ):
+        super().__init__()
+        self.bucket = bucket
+        self.region = region
+        self.key_prefix = key_prefix
+        self.endpoint_url = endpoint_url
+        self.public_url = (public_url or self._default_public_url()).rstrip("/") + "/"
+        self._client = client
+        self._transfer_config = None
+        self._client_lock = threading.Lock()
+
+    def _default_public_url(self) -> str:
+        if self.endpoint_url:
+            return f"{self.endpoint_url.rstrip('/')}/{self.bucket}"
+        return f"https://{self.bucket}.s3.{self.region}.amazonaws.com"
+
+    @property
+    def client(self):
+        # boto3 is only imported once the first upload needs it
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    import boto3
+                    from botocore.config import Config
+
+                    self._client = boto3.client(
+                        "s3",
+                        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+                        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+                        region_name=self.region,
+                        endpoint_url=self.endpoint_url,
+                        config=Config(
+                            retries={"max_attempts": S3_MAX_ATTEMPTS, "mode": "adaptive"},
+                            # One connection per part thread of every concurrent upload
+                            max_pool_connections=max(10, STORAGE_UPLOAD_WORKERS * S3_PART_CONCURRENCY),
+                        ),
+                    )
+        return self._client
+
+    @property
+    def transfer_config(self):
+        if self._transfer_config is None:
+            from boto3.s3.transfer import TransferConfig
+
+            self._transfer_config = TransferConfig(
+                multipart_threshold=S3_MULTIPART_THRESHOLD,
+                multipart_chunksize=S3_PART_SIZE,
+                max_concurrency=S3_PART_CONCURRENCY,
+                use_threads=True,
+            )
+        return self._transfer_config
+
+    def _object_key(self, key: str) -> str:
+        return f"{self.key_prefix}{key}"
+
+    def _exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def _put_file(self, path: Path, key: str, content_type: Optional[str]):
+        extra_args = {"CacheControl": "public, max-age=31536000, immutable"}
+        if content_type:
+            extra_args["ContentType"] = content_type
+        # upload_file aborts the multipart upload itself if a part fails for good
+        self.client.upload_file(
+            str(path), self.bucket, self._object_key(key), ExtraArgs=extra_args, Config=self.transfer_config
+        )
+        path.unlink(missing_ok=True)
+
+    def _delete(self, key: str) -> bool:
+        self.client.delete_object(Bucket=self.bucket, Key=self._object_key(key))
+        return True
+
+    def url_for(self, key: str) -> str:
+        return f"{self.public_url}{self._object_key(key)}"
+
+    def key_for(self, url: str) -> Optional[str]:
+        prefix = f"{self.public_url}{self.key_prefix}"
+        if url.startswith(prefix):
+            return url[len(prefix):]
+        return None
+
+
+_upload_executor = None
+_upload_executor_lock = threading.Lock()
+_storage: Optional[StorageBackend] = None
+_storage_lock = threading.Lock()
+
+
+def get_upload_executor():
+    global _upload_executor
+    if _upload_executor is None:
+        with _upload_executor_lock:
+            if _upload_executor is None:
+                _upload_executor = ThreadPoolExecutor(
+                    max_workers=STORAGE_UPLOAD_WORKERS, thread_name_prefix="storage-upload"
+                )
+    return _upload_executor
+
+
+def shutdown_upload_executor():
+    global _upload_executor
+    if _upload_executor is not None:
+        _upload_executor.shutdown(wait=True, cancel_futures=True)
+        _upload_executor = None
+
+
+def make_storage(backend: str = STORAGE_BACKEND) -> StorageBackend:
+    from app.utils.file_handler import UPLOAD_DIR, UPLOAD_URL_PREFIX
+
+    if backend == "s3":
+        return S3Storage()
+    if backend == "memory":
+        return MemoryStorage()
+    return LocalStorage(UPLOAD_DIR, UPLOAD_URL_PREFIX)
+
+
+def get_storage() -> StorageBackend:
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = make_storage()
+    return _storage
+
+
+def set_storage(storage: StorageBackend):
+    """Swap the backend, e.g. for a MemoryStorage or a moto-backed S3Storage in tests"""
+    global _storage
+    _storage = storage
+
+
+def get_storage_stats() -> dict:
+    return get_storage().stats()
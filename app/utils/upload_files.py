@@ -0,0 +1,115 @@
+"""
+Serving the /uploads mount
+
+save_product_image names files after their content hash, so a URL never changes
+meaning: those files go out with a one-year immutable Cache-Control and browsers
+and CDNs never revalidate them. Anything else under uploads/ gets UPLOADS_MAX_AGE.
+
+Images are negotiated on Accept. When the client takes AVIF or WebP and
+image_variants has built such an alternate (<hash>.full.avif for an original,
+<hash>.thumb.avif for a WebP thumbnail), the smallest one is sent in place of
+the requested file, with Vary: Accept so caches keep them apart.
+
+Byte ranges, If-Range and ETag/Last-Modified revalidation come from Starlette's
+FileResponse. On servers that implement the ASGI pathsend extension (e.g.
+Granian) the body is handed to the server to sendfile; elsewhere it is streamed
+in UPLOADS_CHUNK_SIZE reads.
+"""
+import os
+import re
+import stat
+from pathlib import Path
+from typing import List, Optional, Set, Tuple
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+
+UPLOADS_MAX_AGE = int(os.getenv("UPLOADS_MAX_AGE", 3600))
+UPLOADS_CHUNK_SIZE = int(os.getenv("UPLOADS_CHUNK_SIZE", 256 * 1024))
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# <hash>.<ext> as stored by save_product_image, or <hash>.<size>.<format> as built by image_variants
+CONTENT_ADDRESSED = re.compile(r"^(?P<hash>[0-9a-f]{32})(?:\.(?P<size>[a-z0-9_-]+))?\.(?P<ext>[a-z0-9]+)$")
+NEGOTIABLE_EXTENSIONS = {"jpg", "jpeg", "png", "gif", "webp", "avif"}
+ALTERNATE_FORMATS = ("avif", "webp")
+
+
+class UploadFileResponse(FileResponse):
+    # Larger reads than Starlette's 64 KiB when the server can't sendfile
+    chunk_size = UPLOADS_CHUNK_SIZE
+
+
+def accepted_image_formats(accept: str) -> Set[str]:
+    """Image subtypes the client lists explicitly with a non-zero q; image/* does not count"""
+    formats = set()
+    for item in accept.split(","):
+        media_type, *params = item.split(";")
+        media_type = media_type.strip().lower()
+        if not media_type.startswith("image/") or media_type == "image/*":
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            formats.add(media_type[len("image/"):])
+    return formats
+
+
+def alternate_candidates(path: Path) -> List[Tuple[str, Path]]:
+    """(format, path) of the files that may stand in for `path`"""
+    match = CONTENT_ADDRESSED.match(path.name)
+    if match is None or match["ext"] not in NEGOTIABLE_EXTENSIONS:
+        return []
+    # Originals are re-encoded at full size as <hash>.full.<format>
+    size = match["size"] or "full"
+    return [
+        (fmt, path.with_name(f"{match['hash']}.{size}.{fmt}"))
+        for fmt in ALTERNATE_FORMATS
+        if fmt != match["ext"]
+    ]
+
+
+def _stat_file(path: Path) -> Optional[os.stat_result]:
+    try:
+        stat_result = path.stat()
+    except OSError:
+        return None
+    return stat_result if stat.S_ISREG(stat_result.st_mode) else None
+
+
+class UploadFiles(StaticFiles):
+    """StaticFiles with long-lived caching and Accept negotiation for uploaded images"""
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope, status_code: int = 200):
+        request_headers = Headers(scope=scope)
+        path = Path(full_path)
+        headers = {}
+        immutable = CONTENT_ADDRESSED.match(path.name) is not None
+
+        candidates = alternate_candidates(path)
+        if candidates:
+            headers["Vary"] = "Accept"
+            wanted = accepted_image_formats(request_headers.get("accept", ""))
+            offered = [candidate for fmt, candidate in candidates if fmt in wanted]
+            # One stat per sibling file, the same cost as the lookup StaticFiles already did
+            existing = [(candidate, _stat_file(candidate)) for candidate in offered]
+            existing = [(candidate, result) for candidate, result in existing if result is not None]
+            if existing:
+                # AVIF is usually but not always the smaller one
+                path, stat_result = min(existing, key=lambda item: item[1].st_size)
+            elif offered:
+                # Variants are built after the upload returns; don't pin the
+                # original in shared caches for a year while they are missing
+                immutable = False
+
+        headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL if immutable else f"public, max-age={UPLOADS_MAX_AGE}"
+        response = UploadFileResponse(path, status_code=status_code, stat_result=stat_result, headers=headers)
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
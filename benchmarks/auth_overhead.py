@@ -0,0 +1,61 @@
+"""
+Per-request authentication overhead: the original python-jose verify_token
+versus the cached HS256 fast path in app.utils.jwt_utils.
+
+    python -m benchmarks.auth_overhead [iterations]
+"""
+import contextlib
+import os
+import sys
+import time
+from typing import Optional
+from jose import JWTError, jwt
+from app.utils import jwt_utils
+from app.utils.jwt_utils import TokenData, create_access_token
+
+
+def verify_token_before(token: str) -> Optional[TokenData]:
+    """verify_token as it was: full jose decode, stdout logging, TokenData on every call"""
+    try:
+        payload = jwt.decode(token, jwt_utils.SECRET_KEY, algorithms=[jwt_utils.ALGORITHM])
+        print("JWT PAYLOAD:", payload)
+
+        user_id = payload.get("user_id")
+        email = payload.get("email")
+
+        if user_id is None or email is None:
+            return None
+
+        return TokenData(user_id=user_id, email=email)
+
+    except JWTError:
+        return None
+
+
+def per_call_us(fn, token: str, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn(token)
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    token = create_access_token({"user_id": 1, "email": "bench@example.com"})
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        before = per_call_us(verify_token_before, token, iterations)
+
+    jwt_utils.token_cache.clear()
+    cold = per_call_us(lambda t: (jwt_utils.token_cache.clear(), jwt_utils.verify_token(t)), token, iterations)
+    warm = per_call_us(jwt_utils.verify_token, token, iterations)
+
+    print(f"iterations:                 {iterations}")
+    print(f"before (jose + print):      {before:8.2f} us/request")
+    print(f"after, cache miss (HS256):  {cold:8.2f} us/request")
+    print(f"after, cache hit:           {warm:8.2f} us/request")
+    print(f"speedup on cache hit:       {before / warm:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Cart query counts: a 50-line cart must load and be filled with the same number
+of SQL statements as a 1-line cart, checked with app.utils.query_counter.
+
+    python -m benchmarks.cart_queries [lines]
+
+Runs against a throwaway SQLite database. For each cart size it counts the
+statements of bulk_add_to_cart, and of get_order_with_items followed by the
+serialization /cart/{order_id}/ does and a read of each line's product. The
+async crud cannot lazy-load at all, so the sync path is the one that could
+regress. The big cart must stay within the small cart's counts; otherwise
+assert_max_queries fails with the offending SQL.
+"""
+import os
+import sys
+import tempfile
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'cart_queries.db')}"
+
+from decimal import Decimal
+from database import Base, SessionLocal, engine
+from app.models import Category, Product, User
+from app.crud import cart as cart_crud
+from app.schemas import cart as cart_schemas
+from app.utils.query_counter import assert_max_queries, count_queries
+
+
+def seed(products: int):
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        db.add(Category(id=1, name="Bench", slug="bench"))
+        db.add_all(
+            Product(id=i, category_id=1, title=f"Product {i}", price=Decimal("9.99"), in_stock=True)
+            for i in range(1, products + 1)
+        )
+        db.add_all(User(id=i, email=f"user{i}@example.com", hashed_password="x") for i in (1, 2))
+        db.commit()
+    finally:
+        db.close()
+
+
+def fill_cart(user_id: int, lines: int):
+    """POST /cart/add-items/ for `lines` products"""
+    db = SessionLocal()
+    try:
+        items = [cart_schemas.CartItemCreate(product_id=i, quantity=1) for i in range(1, lines + 1)]
+        assert len(cart_crud.bulk_add_to_cart(db, user_id=user_id, lines=items)) == lines
+    finally:
+        db.close()
+
+
+def pending_order_id(user_id: int) -> int:
+    db = SessionLocal()
+    try:
+        return cart_crud.get_pending_order_for_user(db, user_id).id
+    finally:
+        db.close()
+
+
+def view_cart(order_id: int) -> cart_schemas.Order:
+    """GET /cart/{order_id}/ plus a read of every line's product, which the same load promises"""
+    db = SessionLocal()
+    try:
+        order = cart_crud.get_order_with_items(db, order_id=order_id)
+        assert all(item.product.in_stock for item in order.items)
+        return cart_schemas.Order.model_validate(order, from_attributes=True)
+    finally:
+        db.close()
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    seed(lines)
+
+    with count_queries(engine) as small_fill:
+        fill_cart(1, 1)
+    small_order = pending_order_id(1)
+    with count_queries(engine) as small_view:
+        view_cart(small_order)
+    print(f"{1:>4} line    fill {small_fill.count:>3} queries   view {small_view.count:>3} queries")
+
+    # The big cart may not need a single statement more than the small one
+    with assert_max_queries(engine, small_fill.count) as big_fill:
+        fill_cart(2, lines)
+    big_order = pending_order_id(2)
+    with assert_max_queries(engine, small_view.count) as big_view:
+        cart = view_cart(big_order)
+    assert len(cart.items) == lines
+    print(f"{lines:>4} lines   fill {big_fill.count:>3} queries   view {big_view.count:>3} queries")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+List endpoint serialization: FastAPI's response_model path versus the fast path
+in app.utils.fast_json, on in-memory Product rows (no database involved).
+
+    python -m benchmarks.serialization [repeats] [sizes...]
+
+"before" is what FastAPI does with ORM rows returned under
+response_model=List[Product]: validate every row with from_attributes,
+serialize the result to JSON-compatible Python, then json.dumps it in
+JSONResponse. "after" copies the schema fields off the rows and encodes them
+with orjson (or json when orjson is missing).
+"""
+import asyncio
+import json
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import List
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from app.models.product import Product
+from app.schemas import product as product_schemas
+from app.utils import fast_json
+
+
+def make_products(count: int) -> List[Product]:
+    created = datetime(2024, 1, 1, 12, 0, 0)
+    return [
+        Product(
+            id=i,
+            category_id=i % 20 + 1,
+            title=f"Product {i}",
+            brand=f"Brand {i % 50}",
+            description="A reasonably sized product description " * 3,
+            price=Decimal(f"{i % 1000}.99"),
+            image_url=f"/uploads/products/{i:032x}.png",
+            thumbnail_url=f"/uploads/products/{i:032x}.thumb.webp",
+            image_variants={"thumb.webp": f"/uploads/products/{i:032x}.thumb.webp"},
+            in_stock=i % 7 != 0,
+            created_at=created + timedelta(minutes=i),
+            updated_at=None,
+        )
+        for i in range(count)
+    ]
+
+
+def before(field, rows) -> bytes:
+    content = asyncio.run(serialize_response(field=field, response_content=rows))
+    return JSONResponse(content).body
+
+
+def after(rows) -> bytes:
+    return fast_json.FastJSONResponse(fast_json.dump_rows(rows, product_schemas.Product)).body
+
+
+def median_ms(fn, repeats: int) -> float:
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 7
+    sizes = [int(size) for size in sys.argv[2:]] or [1000, 10000]
+    field = create_model_field("Response", List[product_schemas.Product], mode="serialization")
+
+    print(f"encoder: {'orjson' if fast_json.orjson else 'json (orjson not installed)'}, median of {repeats} runs")
+    for size in sizes:
+        rows = make_products(size)
+        # Both paths must produce the same document
+        assert json.loads(before(field, rows)) == json.loads(after(rows))
+        slow = median_ms(lambda: before(field, rows), repeats)
+        fast = median_ms(lambda: after(rows), repeats)
+        print(f"{size:>6} products   before {slow:8.1f} ms   after {fast:7.1f} ms   speedup {slow / fast:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
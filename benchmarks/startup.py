@@ -0,0 +1,74 @@
+"""
+Worker cold start: how long `import main` takes and how much memory it leaves
+behind, measured in fresh interpreters with `python -X importtime`.
+
+    python -m benchmarks.startup [runs] [top]
+
+Each run imports the app against a throwaway SQLite database, so the tables
+main.py creates on import never touch the real one. Reports the median total
+import time, peak RSS, the slowest modules by cumulative time, and whether the
+heavy optional clients (boto3, fastapi_mail) were loaded eagerly.
+"""
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+
+HEAVY_MODULES = ("boto3", "botocore", "fastapi_mail", "jinja2")
+
+PROBE = (
+    "import resource, sys, main; "
+    "print('RSS_KB', resource.getrusage(resource.RUSAGE_SELF).ru_maxrss); "
+    f"print('HEAVY', ','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+)
+
+LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def run_once(env: dict):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        capture_output=True, text=True, env=env, check=True,
+    )
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            cumulative[match.group(4)] = int(match.group(2))
+    out = dict(line.split(" ", 1) for line in result.stdout.splitlines() if line.startswith(("RSS_KB", "HEAVY")))
+    heavy = out.get("HEAVY", "").strip()
+    return cumulative, int(out["RSS_KB"]), heavy.split(",") if heavy else []
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    top = int(sys.argv[2]) if len(sys.argv) > 2 else 15
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ)
+        env["DATABASE_URL"] = f"sqlite:///{tmp}/startup.db"
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.getcwd(), env.get("PYTHONPATH")]))
+
+        totals, rss, per_module, heavy = [], [], defaultdict(list), []
+        for _ in range(runs):
+            cumulative, rss_kb, heavy = run_once(env)
+            totals.append(cumulative.get("main", 0))
+            rss.append(rss_kb)
+            for module, us in cumulative.items():
+                per_module[module].append(us)
+
+    print(f"runs:                  {runs}")
+    print(f"import main (median):  {statistics.median(totals) / 1000:8.1f} ms")
+    print(f"peak RSS (median):     {statistics.median(rss) / 1024:8.1f} MB")
+    print(f"heavy modules loaded:  {', '.join(heavy) or 'none'}")
+    print(f"\nslowest {top} modules by cumulative import time (median ms):")
+    ranked = sorted(per_module.items(), key=lambda item: statistics.median(item[1]), reverse=True)
+    for module, samples in ranked[:top]:
+        print(f"  {statistics.median(samples) / 1000:8.1f}  {module}")
+
+
+if __name__ == "__main__":
+    main()
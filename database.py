@@ -1,25 +1,220 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
+import itertools
 import os
 
 
 DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./ecommerce.db")
 
+# "sync" serves the routers from the threadpool, "async" switches them to
+# async def endpoints backed by the async engine below
+DB_MODE = os.environ.get("DB_MODE", "sync").lower()
+ASYNC_DB = DB_MODE == "async"
 
-connect_args = {}
-if DATABASE_URL.startswith("sqlite://"):
-    connect_args["check_same_thread"] = False
 
-engine = create_engine(
-    DATABASE_URL, 
-    connect_args=connect_args
-)
+def to_async_url(url: str) -> str:
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    if url.startswith("postgres://"):
+        return url.replace("postgres://", "postgresql+asyncpg://", 1)
+    return url
+
+
+ASYNC_DATABASE_URL = os.environ.get("ASYNC_DATABASE_URL", to_async_url(DATABASE_URL))
+
+# Comma separated read replicas used by get_read_db for catalog reads
+DATABASE_REPLICA_URLS = [
+    url.strip() for url in os.environ.get("DATABASE_REPLICA_URLS", "").split(",") if url.strip()
+]
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.environ.get(name, str(default)).lower() in ("1", "true", "yes", "on")
+
+
+# Connection pool
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", True)
+
+# SQLite performance profile, applied to every new connection
+SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+SQLITE_CACHE_SIZE = int(os.environ.get("SQLITE_CACHE_SIZE", -64000))  # negative = KiB, so 64MB
+SQLITE_BUSY_TIMEOUT = int(os.environ.get("SQLITE_BUSY_TIMEOUT", 5000))  # ms
+
+
+def _is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+def _is_memory_sqlite(url: str) -> bool:
+    return _is_sqlite(url) and (":memory:" in url or url.rstrip("/").endswith("sqlite:"))
+
+
+def engine_options(url: str) -> dict:
+    """Keyword arguments for create_engine/create_async_engine built from the env settings."""
+    options = {"pool_pre_ping": DB_POOL_PRE_PING}
+    # In-memory SQLite uses a single shared connection, there is nothing to size
+    if not _is_memory_sqlite(url):
+        options.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+        )
+    if url.startswith("sqlite://"):
+        options["connect_args"] = {"check_same_thread": False}
+    return options
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT}")
+        cursor.execute(f"PRAGMA journal_mode = {SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA cache_size = {SQLITE_CACHE_SIZE}")
+        cursor.execute("PRAGMA temp_store = MEMORY")
+    finally:
+        cursor.close()
+
+
+# Pool statistics per engine, served by /diagnostics/db-pool
+POOL_METRICS = {}
+
+
+def instrument_engine(engine, name: str):
+    """Apply the SQLite profile and start collecting pool checkout statistics for `engine`."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if _is_sqlite(str(sync_engine.url)):
+        event.listen(sync_engine, "connect", _apply_sqlite_pragmas)
+
+    metrics = POOL_METRICS[name] = {
+        "engine": sync_engine,
+        "connects": 0,
+        "checkouts": 0,
+        "peak_checked_out": 0,
+        "peak_overflow": 0,
+    }
+
+    def on_connect(dbapi_connection, connection_record):
+        metrics["connects"] += 1
+
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        pool = sync_engine.pool
+        metrics["checkouts"] += 1
+        if hasattr(pool, "checkedout"):
+            metrics["peak_checked_out"] = max(metrics["peak_checked_out"], pool.checkedout())
+            metrics["peak_overflow"] = max(metrics["peak_overflow"], pool.overflow())
+
+    event.listen(sync_engine, "connect", on_connect)
+    event.listen(sync_engine, "checkout", on_checkout)
+    return engine
+
+
+def get_pool_stats() -> dict:
+    stats = {}
+    for name, metrics in POOL_METRICS.items():
+        pool = metrics["engine"].pool
+        entry = {key: value for key, value in metrics.items() if key != "engine"}
+        entry["pool"] = type(pool).__name__
+        for attr in ("size", "checkedin", "checkedout", "overflow"):
+            if hasattr(pool, attr):
+                entry[attr] = getattr(pool, attr)()
+        entry["status"] = pool.status()
+        stats[name] = entry
+    return stats
+
+
+engine = instrument_engine(create_engine(DATABASE_URL, **engine_options(DATABASE_URL)), "primary")
 
 SessionLocal = sessionmaker(autocommit = False, autoflush=False, bind=engine)
 
+replica_engines = [
+    instrument_engine(create_engine(url, **engine_options(url)), f"replica_{i}")
+    for i, url in enumerate(DATABASE_REPLICA_URLS)
+]
+# Round-robin over the replicas, or the primary when none are configured
+ReadSessionLocals = [
+    sessionmaker(autocommit=False, autoflush=False, bind=replica) for replica in replica_engines
+] or [SessionLocal]
+_read_sessions = itertools.cycle(ReadSessionLocals)
+
+# Only built in async mode so the sync deployment does not need aiosqlite/asyncpg
+async_engine = None
+AsyncSessionLocal = None
+if ASYNC_DB:
+    async_engine = instrument_engine(
+        create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL)), "primary_async"
+    )
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+async_replica_engines = []
+AsyncReadSessionLocals = []
+if ASYNC_DB:
+    for i, url in enumerate(DATABASE_REPLICA_URLS):
+        async_url = to_async_url(url)
+        async_replica_engines.append(
+            instrument_engine(create_async_engine(async_url, **engine_options(async_url)), f"replica_{i}_async")
+        )
+    AsyncReadSessionLocals = [
+        async_sessionmaker(replica, autoflush=False, expire_on_commit=False) for replica in async_replica_engines
+    ] or [AsyncSessionLocal]
+_async_read_sessions = itertools.cycle(AsyncReadSessionLocals)
+
+
+async def dispose_async_engines():
+    """Close pooled async connections; aiosqlite's worker threads otherwise keep the process alive"""
+    for async_db_engine in [async_engine, *async_replica_engines]:
+        if async_db_engine is not None:
+            await async_db_engine.dispose()
+
 Base = declarative_base()
 
+
+def ensure_schema(engine):
+    """
+    Bring existing tables up to the models after create_all.
+
+    create_all only creates missing tables, so columns and indexes added to a
+    model later never reach a database created before them. This adds missing
+    nullable columns and creates missing indexes; anything else needs a real
+    migration.
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in columns:
+                    continue
+                if not column.nullable:
+                    print(f"Cannot add NOT NULL column {table.name}.{column.name} without a migration")
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+                print(f"Added column {table.name}.{column.name}")
+            for index in table.indexes:
+                try:
+                    # Savepoint, so a unique index the existing rows violate doesn't abort the rest
+                    with conn.begin_nested():
+                        index.create(conn, checkfirst=True)
+                except IntegrityError as e:
+                    print(f"Cannot create unique index {index.name} until duplicates are removed: {e.orig}")
+
 def get_db():
     db = SessionLocal()
     try:
@@ -28,4 +223,26 @@ def get_db():
     finally:
         db.close()
 
-    
\ No newline at end of file
+
+async def get_async_db():
+    if AsyncSessionLocal is None:
+        raise RuntimeError("Async database is not configured, set DB_MODE=async")
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def get_read_db():
+    """Session for read-only endpoints, spread across the replicas. Never write through it."""
+    db = next(_read_sessions)()
+    try:
+        yield db
+
+    finally:
+        db.close()
+
+
+async def get_async_read_db():
+    if not AsyncReadSessionLocals:
+        raise RuntimeError("Async database is not configured, set DB_MODE=async")
+    async with next(_async_read_sessions)() as db:
+        yield db
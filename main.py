@@ -1,10 +1,20 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from dotenv import load_dotenv
-from database import engine, Base
-from mongo_database import connect_mongo, close_mongo, mongo_db 
-from app.routers import product, category, cart, user, mongo_router
+from database import engine, Base, ASYNC_DB, ensure_schema, dispose_async_engines
+from mongo_database import connect_mongo, close_mongo
+from app.routers import mongo_router, diagnostics
+if ASYNC_DB:
+    from app.routers.aio import product, category, cart, user
+else:
+    from app.routers import product, category, cart, user
+from app.crud.search import ensure_search_index
+from app.utils.cache import start_invalidation_listener
+from app.utils.password_hashing import shutdown_executor
+from app.utils.email_queue import start_email_workers, stop_email_workers
+from app.utils import image_variants
+from app.utils.storage import shutdown_upload_executor
+from app.utils.upload_files import UploadFiles
 import app.models 
 
 load_dotenv()
@@ -25,22 +35,30 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Mount static files directory for uploaded images
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+# Mount static files directory for uploaded images (cache headers, ranges, AVIF/WebP negotiation)
+app.mount("/uploads", UploadFiles(directory="uploads"), name="uploads")
 
 # Create database tables
 print("Creating database tables if they don't exist...")
 Base.metadata.create_all(bind=engine)
+ensure_schema(engine)
+ensure_search_index(engine)
 print("Database tables ensured.")
 
 @app.on_event("startup")
 async def startup_db_client():
+    start_invalidation_listener()
+    start_email_workers()
     await connect_mongo()
-    app.state.mongo_db_client = mongo_db.client
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
     await close_mongo()
+    await stop_email_workers()
+    shutdown_executor()
+    image_variants.shutdown_executor()
+    shutdown_upload_executor()
+    await dispose_async_engines()
 
 
 app.include_router(product.router, prefix="/products", tags=["products"])
@@ -48,6 +66,7 @@ app.include_router(user.router, prefix="/users", tags=["users"])
 app.include_router(cart.router, prefix="/cart", tags=["cart"])
 app.include_router(category.router,prefix="/catgory", tags=["category"])
 app.include_router(mongo_router.router, prefix="/mongo", tags=["mongo_items"]) 
+app.include_router(diagnostics.router, prefix="/diagnostics", tags=["diagnostics"])
 
 
 @app.get("/")
@@ -1,19 +1,150 @@
 import os
+import threading
+from bisect import bisect_left
+from importlib.util import find_spec
+from typing import Dict, List, Optional
 from motor.motor_asyncio import AsyncIOMotorClient
-from fastapi import Request
+from pymongo import monitoring
+from pymongo.errors import OperationFailure
+from fastapi import HTTPException, Request, status
 
 MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
 MONGO_DB_NAME = "ecommerce_db"
 
+
+def _env_optional_int(name: str) -> Optional[int]:
+    value = os.environ.get(name)
+    return int(value) if value else None
+
+
+# Client settings; they take precedence over the same options in MONGO_URL
+MONGO_MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL_SIZE", 100))
+MONGO_MIN_POOL_SIZE = int(os.environ.get("MONGO_MIN_POOL_SIZE", 0))
+MONGO_MAX_IDLE_TIME_MS = _env_optional_int("MONGO_MAX_IDLE_TIME_MS")
+MONGO_WAIT_QUEUE_TIMEOUT_MS = _env_optional_int("MONGO_WAIT_QUEUE_TIMEOUT_MS")
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000))
+MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get("MONGO_CONNECT_TIMEOUT_MS", 5000))
+MONGO_SOCKET_TIMEOUT_MS = _env_optional_int("MONGO_SOCKET_TIMEOUT_MS")
+MONGO_READ_PREFERENCE = os.environ.get("MONGO_READ_PREFERENCE", "primary")
+# "majority" or a number of members; unset keeps the server's default
+MONGO_WRITE_CONCERN = os.environ.get("MONGO_WRITE_CONCERN")
+MONGO_WTIMEOUT_MS = _env_optional_int("MONGO_WTIMEOUT_MS")
+MONGO_COMPRESSORS = [c.strip() for c in os.environ.get("MONGO_COMPRESSORS", "zstd,snappy,zlib").split(",") if c.strip()]
+
+# Python package each wire compressor needs
+_COMPRESSOR_MODULES = {"zstd": "zstandard", "snappy": "snappy", "zlib": "zlib"}
+# Upper bounds (ms) of the latency histogram buckets; one more bucket holds the rest
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+
+class CommandLatencyMonitor(monitoring.CommandListener):
+    """Per-command latency histograms fed by the driver's command monitoring events"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._commands: Dict[str, dict] = {}
+
+    def _record(self, event, failed: bool):
+        elapsed_ms = event.duration_micros / 1000
+        with self._lock:
+            stats = self._commands.get(event.command_name)
+            if stats is None:
+                stats = self._commands[event.command_name] = {
+                    "count": 0,
+                    "failed": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "buckets": [0] * (len(LATENCY_BUCKETS_MS) + 1),
+                }
+            stats["count"] += 1
+            stats["failed"] += failed
+            stats["total_ms"] += elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+            stats["buckets"][bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event, failed=False)
+
+    def failed(self, event):
+        self._record(event, failed=True)
+
+    @staticmethod
+    def _percentile(stats: dict, fraction: float) -> float:
+        # Upper bound of the bucket the percentile falls in
+        wanted = fraction * stats["count"]
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS_MS, stats["buckets"]):
+            seen += count
+            if seen >= wanted:
+                return min(bound, round(stats["max_ms"], 3))
+        return round(stats["max_ms"], 3)
+
+    def stats(self) -> dict:
+        with self._lock:
+            commands = {name: dict(stats, buckets=list(stats["buckets"])) for name, stats in self._commands.items()}
+        labels = [f"<={bound}ms" for bound in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+        return {
+            name: {
+                "count": stats["count"],
+                "failed": stats["failed"],
+                "avg_ms": round(stats["total_ms"] / stats["count"], 3),
+                "max_ms": round(stats["max_ms"], 3),
+                "p50_ms": self._percentile(stats, 0.50),
+                "p95_ms": self._percentile(stats, 0.95),
+                "p99_ms": self._percentile(stats, 0.99),
+                "histogram": dict(zip(labels, stats["buckets"])),
+            }
+            for name, stats in sorted(commands.items())
+        }
+
+
+command_monitor = CommandLatencyMonitor()
+
+
+def available_compressors(names: List[str]) -> List[str]:
+    """The compressors in `names` whose Python package is installed, in order of preference"""
+    return [name for name in names if name in _COMPRESSOR_MODULES and find_spec(_COMPRESSOR_MODULES[name])]
+
+
+def mongo_client_options() -> dict:
+    """Keyword arguments for AsyncIOMotorClient built from the env settings"""
+    options = {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS,
+        "readPreference": MONGO_READ_PREFERENCE,
+    }
+    if MONGO_MAX_IDLE_TIME_MS is not None:
+        options["maxIdleTimeMS"] = MONGO_MAX_IDLE_TIME_MS
+    if MONGO_WAIT_QUEUE_TIMEOUT_MS is not None:
+        options["waitQueueTimeoutMS"] = MONGO_WAIT_QUEUE_TIMEOUT_MS
+    if MONGO_WRITE_CONCERN:
+        options["w"] = int(MONGO_WRITE_CONCERN) if MONGO_WRITE_CONCERN.isdigit() else MONGO_WRITE_CONCERN
+    if MONGO_WTIMEOUT_MS is not None:
+        options["wTimeoutMS"] = MONGO_WTIMEOUT_MS
+    compressors = available_compressors(MONGO_COMPRESSORS)
+    if compressors:
+        # The server picks the first one it also supports
+        options["compressors"] = ",".join(compressors)
+    return options
+
+
 class MongoDatabase:
     client: AsyncIOMotorClient = None
     db = None
 
 mongo_db = MongoDatabase()
+_collections = {}
 
 async def connect_mongo():
-    mongo_db.client = AsyncIOMotorClient(MONGO_URL)
+    mongo_db.client = AsyncIOMotorClient(MONGO_URL, event_listeners=[command_monitor], **mongo_client_options())
     mongo_db.db = mongo_db.client[MONGO_DB_NAME]
+    _collections.clear()
     # Verify connection
     try:
         await mongo_db.client.admin.command('ping')
@@ -21,11 +152,48 @@ async def connect_mongo():
     except Exception as e:
         print(f"Failed to connect to MongoDB: {e}")
         raise
+    await ensure_mongo_indexes(mongo_db.db)
+
+async def ensure_mongo_indexes(db):
+    # Backs the per-user wishlist listing: equality on the user, then the
+    # (priority, _id) order its keyset pagination walks
+    await db["wishlist"].create_index(
+        [("user_id_sqlite", 1), ("priority", 1), ("_id", 1)],
+        name="user_priority_id",
+    )
+    # Wishlist writes upsert on (user, product); the unique index keeps
+    # concurrent upserts from inserting the same item twice
+    try:
+        await db["wishlist"].create_index(
+            [("user_id_sqlite", 1), ("product_name", 1)],
+            name="user_product_unique",
+            unique=True,
+        )
+    except OperationFailure as e:
+        # Duplicates written before upserts existed; remove them and restart
+        print(f"Could not create unique wishlist index: {e}")
 
 async def close_mongo():
-    mongo_db.client.close()
+    _collections.clear()
+    if mongo_db.client is not None:
+        mongo_db.client.close()
     print("MongoDB connection closed.")
 
+def get_collection(name: str):
+    """The named collection of the app database, built once and reused by every request"""
+    collection = _collections.get(name)
+    if collection is None:
+        if mongo_db.db is None:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="MongoDB is not connected"
+            )
+        collection = _collections[name] = mongo_db.db[name]
+    return collection
+
 def get_mongo_db(request: Request):
-    return request.app.state.mongo_db_client[MONGO_DB_NAME]
+    return mongo_db.db
 
+def get_mongo_stats() -> dict:
+    options = mongo_client_options()
+    return {"client": options, "commands": command_monitor.stats()}